@@ -0,0 +1,84 @@
+"""
+Per-user, per-topic attempt numbering.
+
+One document per (username, topic_name) in ``attempt_counters`` holds the
+number of the last stored attempt. The number is claimed with an atomic
+$inc when the attempt is stored, so two tabs finishing the same topic get
+different numbers.
+
+Counters for attempts stored before this collection existed are filled in
+once with:
+
+    python attempt_counters.py --backfill
+"""
+import argparse
+from pymongo import MongoClient, ASCENDING, ReturnDocument, UpdateOne
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+
+def ensure_attempt_counter_indexes(db):
+    db.attempt_counters.create_index([("username", ASCENDING), ("topic_name", ASCENDING)], unique=True)
+
+
+def claim_attempt_number(db, username: str, topic_name: str) -> int:
+    """Atomically advance the counter and return the number for the attempt being stored."""
+    counter = db.attempt_counters.find_one_and_update(
+        {"username": username, "topic_name": topic_name},
+        {"$inc": {"last_attempt": 1}},
+        projection={"last_attempt": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["last_attempt"]
+
+
+def delete_attempt_counters(db, username: str):
+    db.attempt_counters.delete_many({"username": username})
+
+
+def backfill_attempt_counters(db) -> int:
+    """
+    Set every counter to at least the highest attempt number (or attempt
+    count) found in test_attempts. Uses $max, so it is safe to run while
+    attempts are being stored and to run again. Returns the number of
+    (username, topic) pairs seen.
+    """
+    ensure_attempt_counter_indexes(db)
+    pipeline = [
+        {"$group": {
+            "_id": {"username": "$username", "topic_name": "$topic_name"},
+            "highest": {"$max": "$attempt_number"},
+            "count": {"$sum": 1},
+        }}
+    ]
+    operations = []
+    for group in db.test_attempts.aggregate(pipeline):
+        last_attempt = max(group.get("highest") or 0, group["count"])
+        operations.append(UpdateOne(
+            {"username": group["_id"]["username"], "topic_name": group["_id"]["topic_name"]},
+            {"$max": {"last_attempt": last_attempt}},
+            upsert=True
+        ))
+    if operations:
+        db.attempt_counters.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-user, per-topic attempt counters.")
+    parser.add_argument("--backfill", action="store_true", help="Fill counters from existing test_attempts")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    if args.backfill:
+        print(f"Backfilled counters for {backfill_attempt_counters(db)} user/topic pairs.")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
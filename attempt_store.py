@@ -0,0 +1,312 @@
+"""
+Compact storage for test attempts.
+
+An attempt no longer embeds the question text and answers for every
+question. It stores the per-question data as compact vectors:
+
+    question_ids  stable question ids, in the order the questions were shown
+    answers       one character per question: A-D, or "-" when not answered
+    correct       one character per question: "1" correct, "0" not
+    time_taken    float32 seconds per question, packed into BSON binary
+    unanswered    number of questions not answered, so scoring schemes with
+                  negative marks work from counts alone
+
+Question text, options and the answer key live once per question in the
+``questions`` collection, keyed by the question id, and are only joined
+when a detailed view asks for them. A question id is derived from the
+question text and options, so the same question keeps its id across
+uploads, parser versions and answer-key fixes.
+
+Attempts stored with a full ``results`` array, or with a string
+timestamp, are converted with:
+
+    python attempt_store.py --migrate
+    python attempt_store.py --migrate-timestamps
+    python attempt_store.py --report
+"""
+import hashlib
+import argparse
+from array import array
+from datetime import datetime
+from collections import defaultdict
+from bson import BSON, Binary
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+ATTEMPT_FORMAT = 2
+NOT_ANSWERED = "-"
+
+# Formats the timestamp string was written in before it became a BSON datetime
+LEGACY_TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def ensure_attempt_indexes(db):
+    """Serves the per-user topic lookups and the newest-first attempt history of one topic."""
+    db.test_attempts.create_index([("username", ASCENDING), ("topic_name", ASCENDING), ("timestamp", DESCENDING)])
+
+
+def question_id(question) -> str:
+    """Stable id of a parsed Question: a hash of its text and options, not of its answer."""
+    digest = hashlib.sha1(question.question.encode("utf-8"))
+    for letter, text in question.options:
+        digest.update(b"\x1f" + letter.encode("utf-8") + b"\x1e" + text.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def legacy_question_id(question_text: str) -> str:
+    """Id for a question only known from an old attempt's results, where options were not kept."""
+    return "legacy-" + hashlib.sha1(question_text.encode("utf-8")).hexdigest()[:16]
+
+
+def store_questions(db, questions):
+    """Make sure every question has its document in ``questions``; existing ones are left alone."""
+    operations = [
+        UpdateOne({"_id": question_id(q)},
+                  {"$setOnInsert": {"question": q.question, "options": dict(q.options), "answer": q.answer}},
+                  upsert=True)
+        for q in questions
+    ]
+    if operations:
+        db.questions.bulk_write(operations, ordered=False)
+
+
+def pack_times(times) -> Binary:
+    return Binary(array("f", times).tobytes())
+
+
+def unpack_times(packed) -> list:
+    times = array("f")
+    times.frombytes(bytes(packed))
+    return times.tolist()
+
+
+def compact_results(question_ids: list, results: list) -> dict:
+    """The compact per-question fields of an attempt, from the results shown on the completion page."""
+    answers = []
+    for result in results:
+        answer = result.get("user_answer")
+        answers.append(answer if answer in ("A", "B", "C", "D") else NOT_ANSWERED)
+    times = [float(result.get("time_taken") or 0) for result in results]
+    return {
+        "format": ATTEMPT_FORMAT,
+        "question_ids": list(question_ids),
+        "answers": "".join(answers),
+        "correct": "".join("1" if result.get("is_correct") else "0" for result in results),
+        "time_taken": pack_times(times),
+        "question_time_total": sum(times),
+        "unanswered": answers.count(NOT_ANSWERED),
+    }
+
+
+def attempt_question_times(attempt: dict) -> list:
+    """Seconds per question for an attempt in either storage format."""
+    if "time_taken" in attempt:
+        return unpack_times(attempt["time_taken"])
+    return [r["time_taken"] for r in attempt.get("results", []) if "time_taken" in r]
+
+
+def attempt_correct_count(attempt: dict) -> int:
+    if "correct" in attempt:
+        return attempt["correct"].count("1")
+    return sum(1 for r in attempt.get("results", []) if r.get("is_correct"))
+
+
+def attempt_question_count(attempt: dict) -> int:
+    if "correct" in attempt:
+        return len(attempt["correct"])
+    return len(attempt.get("results", []))
+
+
+def attempt_unanswered_count(attempt: dict) -> int:
+    if "unanswered" in attempt:
+        return attempt["unanswered"]
+    if "answers" in attempt:
+        return attempt["answers"].count(NOT_ANSWERED)
+    return sum(1 for r in attempt.get("results", []) if r.get("user_answer") not in ("A", "B", "C", "D"))
+
+
+def load_attempt_results(db, attempt: dict) -> list:
+    """
+    Per-question result dicts (question, user_answer, correct_answer,
+    is_correct, time_taken) for a detailed view, joining the question text in
+    one query. Old attempts that still embed ``results`` are returned as is.
+    """
+    if "question_ids" not in attempt:
+        return attempt.get("results", [])
+    ids = attempt["question_ids"]
+    questions = {q["_id"]: q for q in db.questions.find({"_id": {"$in": list(set(ids))}}, {"question": 1, "answer": 1})}
+    times = unpack_times(attempt["time_taken"])
+    results = []
+    for i, qid in enumerate(ids):
+        question = questions.get(qid, {})
+        answer = attempt["answers"][i]
+        results.append({
+            "question": question.get("question", "Question no longer available"),
+            "user_answer": "Not answered" if answer == NOT_ANSWERED else answer,
+            "correct_answer": question.get("answer", ""),
+            "is_correct": attempt["correct"][i] == "1",
+            "time_taken": times[i] if i < len(times) else 0.0,
+        })
+    return results
+
+
+def seed_questions_from_bank(db) -> int:
+    """Create question documents for every question in the question bank. Returns the bank entries read."""
+    from mcq_parser import Question
+    entries = 0
+    for entry in db.question_bank.find({}, {"questions": 1}):
+        store_questions(db, [Question.from_dict(q) for q in entry.get("questions", [])])
+        entries += 1
+    return entries
+
+
+def migrate_attempts(db, batch_size: int = 500, dry_run: bool = False) -> dict:
+    """
+    Rewrite attempts that embed ``results`` into the compact format.
+
+    Question text is matched against the ``questions`` collection (seeded
+    from the question bank first). Text that matches no question, or more
+    than one, gets a legacy question document built from what the old
+    attempt recorded. Returns a before/after size report.
+    """
+    seed_questions_from_bank(db)
+    ids_by_text = defaultdict(set)
+    for question in db.questions.find({}, {"question": 1}):
+        ids_by_text[question["question"]].add(question["_id"])
+
+    report = {"attempts": 0, "bytes_before": 0, "bytes_after": 0, "legacy_questions": 0}
+    legacy_questions = {}
+    operations = []
+
+    def flush():
+        if operations and not dry_run:
+            db.test_attempts.bulk_write(operations, ordered=False)
+        operations.clear()
+
+    for attempt in db.test_attempts.find({"results": {"$exists": True}}):
+        results = attempt["results"]
+        question_ids = []
+        for result in results:
+            text = result.get("question", "")
+            matches = ids_by_text.get(text, ())
+            if len(matches) == 1:
+                question_ids.append(next(iter(matches)))
+            else:
+                qid = legacy_question_id(text)
+                legacy_questions[qid] = {"question": text, "options": None, "answer": result.get("correct_answer")}
+                question_ids.append(qid)
+        compact = compact_results(question_ids, results)
+
+        migrated = {k: v for k, v in attempt.items() if k != "results"}
+        migrated.update(compact)
+        report["attempts"] += 1
+        report["bytes_before"] += len(BSON.encode(attempt))
+        report["bytes_after"] += len(BSON.encode(migrated))
+        operations.append(UpdateOne({"_id": attempt["_id"]}, {"$set": compact, "$unset": {"results": ""}}))
+        if len(operations) >= batch_size:
+            flush()
+    flush()
+
+    report["legacy_questions"] = len(legacy_questions)
+    if legacy_questions and not dry_run:
+        db.questions.bulk_write([
+            UpdateOne({"_id": qid}, {"$setOnInsert": doc}, upsert=True) for qid, doc in legacy_questions.items()
+        ], ordered=False)
+    return report
+
+
+def parse_legacy_timestamp(value: str):
+    """The datetime of an old string timestamp, or None when it is in no known format."""
+    for timestamp_format in LEGACY_TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, timestamp_format)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def migrate_timestamps(db, batch_size: int = 500) -> dict:
+    """
+    Rewrite string ``timestamp`` values of test_attempts as BSON datetimes and
+    create the (username, topic_name, timestamp) index. Values that cannot be
+    parsed are left alone and listed, never replaced with the current time.
+    Progress rollups copy timestamps, so they are rebuilt afterwards.
+    """
+    from progress_rollups import rebuild_rollups
+    report = {"converted": 0, "unparsed": []}
+    operations = []
+    for attempt in db.test_attempts.find({"timestamp": {"$type": "string"}}, {"timestamp": 1}):
+        parsed = parse_legacy_timestamp(attempt["timestamp"])
+        if parsed is None:
+            report["unparsed"].append((attempt["_id"], attempt["timestamp"]))
+            continue
+        operations.append(UpdateOne({"_id": attempt["_id"]}, {"$set": {"timestamp": parsed}}))
+        if len(operations) >= batch_size:
+            db.test_attempts.bulk_write(operations, ordered=False)
+            report["converted"] += len(operations)
+            operations = []
+    if operations:
+        db.test_attempts.bulk_write(operations, ordered=False)
+        report["converted"] += len(operations)
+    ensure_attempt_indexes(db)
+    rebuild_rollups(db)
+    return report
+
+
+def storage_report(db) -> dict:
+    """Document counts and BSON bytes of attempts in each format and of the shared question documents."""
+    report = {"compact_attempts": 0, "compact_bytes": 0, "embedded_attempts": 0, "embedded_bytes": 0,
+              "questions": 0, "question_bytes": 0}
+    for attempt in db.test_attempts.find():
+        kind = "compact" if "question_ids" in attempt else "embedded"
+        report[f"{kind}_attempts"] += 1
+        report[f"{kind}_bytes"] += len(BSON.encode(attempt))
+    for question in db.questions.find():
+        report["questions"] += 1
+        report["question_bytes"] += len(BSON.encode(question))
+    return report
+
+
+def print_size_line(label: str, count: int, size: int):
+    average = size / count if count else 0
+    print(f"{label:<22}{count:>10}{size / 1024:>14.1f} KB{average:>12.0f} B/doc")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert test attempts to compact storage and report sizes.")
+    parser.add_argument("--migrate", action="store_true", help="Rewrite attempts that embed full results")
+    parser.add_argument("--dry-run", action="store_true", help="With --migrate: report without writing")
+    parser.add_argument("--migrate-timestamps", action="store_true",
+                        help="Convert string timestamps to BSON datetimes and add the history index")
+    parser.add_argument("--report", action="store_true", help="Print current storage sizes")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    if args.migrate:
+        result = migrate_attempts(db, dry_run=args.dry_run)
+        print(f"{'Would migrate' if args.dry_run else 'Migrated'} {result['attempts']} attempts "
+              f"({result['legacy_questions']} questions only known from old results).")
+        print_size_line("Before", result["attempts"], result["bytes_before"])
+        print_size_line("After", result["attempts"], result["bytes_after"])
+        if result["bytes_after"]:
+            print(f"Attempts shrink {result['bytes_before'] / result['bytes_after']:.1f}x")
+    if args.migrate_timestamps:
+        result = migrate_timestamps(db)
+        print(f"Converted {result['converted']} timestamps; {len(result['unparsed'])} could not be parsed.")
+        for attempt_id, value in result["unparsed"]:
+            print(f"  {attempt_id}: {value!r}")
+    if args.report:
+        report = storage_report(db)
+        print_size_line("Compact attempts", report["compact_attempts"], report["compact_bytes"])
+        print_size_line("Embedded attempts", report["embedded_attempts"], report["embedded_bytes"])
+        print_size_line("Question documents", report["questions"], report["question_bytes"])
+    if not (args.migrate or args.migrate_timestamps or args.report):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Write-behind persistence for finished test attempts.
+
+The completion page hands its attempt document to ``AttemptWriter.submit``,
+which gives it an ObjectId straight away and returns without touching
+MongoDB. A background thread drains the queue and writes batches with
+insert_many. Because the ``_id`` is set before the first write, retries are
+idempotent: a document that is already stored is a duplicate key error that
+is ignored. ``on_written`` is called with the attempts each write newly
+stored, so derived data such as progress rollups is updated once per
+attempt.
+
+When the queue is full, or MongoDB rejects a batch, the attempts are appended
+to a local JSON-lines spool file instead of being dropped. The spool is
+replayed into MongoDB when the writer starts, after later successful
+flushes, and every SPOOL_RETRY_INTERVAL while the queue is idle. A batch whose insert failed with a network error may still have
+been committed by the server without ``on_written`` running, so a spooled
+attempt that turns out to be stored already on replay is reported to
+``on_written`` then. The only way derived data misses an attempt is
+``on_written`` itself failing (counted in ``on_written_failures``); the
+rebuild commands of the derived collections repair that.
+"""
+import os
+import time
+import queue
+import atexit
+import threading
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 0.5  # seconds a partial batch may wait before it is written
+DEFAULT_SPOOL_PATH = "attempt_spool.jsonl"
+SPOOL_RETRY_INTERVAL = 30  # seconds between spool replays while no attempts come in
+
+DUPLICATE_KEY = 11000
+
+
+class AttemptWriter:
+    """Bounded write-behind queue of attempt documents with a spool-file fallback."""
+
+    def __init__(self, collection, max_queue: int = DEFAULT_MAX_QUEUE, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, spool_path: str = DEFAULT_SPOOL_PATH,
+                 on_written=None):
+        self.collection = collection
+        self.on_written = on_written  # called with each list of newly stored attempts
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spool_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.written = 0
+        self.spooled = 0
+        self.failed_batches = 0
+        self.on_written_failures = 0
+        self.writer_errors = 0
+        self._next_idle_replay = 0.0
+        self.replay_spool()
+        self._thread = threading.Thread(target=self._run, name="attempt-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, attempt: dict) -> ObjectId:
+        """Queue one attempt and return its id; never blocks on MongoDB."""
+        attempt.setdefault("_id", ObjectId())
+        try:
+            self._queue.put_nowait(attempt)
+        except queue.Full:
+            self._spool([attempt])
+        return attempt["_id"]
+
+    def flush(self, timeout: float = None):
+        """Block until everything queued so far has been written or spooled."""
+        if timeout is None:
+            self._queue.join()
+            return
+        done = threading.Thread(target=self._queue.join, daemon=True)
+        done.start()
+        done.join(timeout)
+
+    def close(self):
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self._thread.join()
+            self._write(self._drain(self._queue.qsize()))
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "spooled": self.spooled,
+            "failed_batches": self.failed_batches,
+            "on_written_failures": self.on_written_failures,
+            "writer_errors": self.writer_errors,
+        }
+
+    def _drain(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._replay_when_idle()
+                continue
+            try:
+                # Give a burst of finishing students a moment to fill the batch
+                self._stopped.wait(self.flush_interval if self._queue.qsize() < self.batch_size - 1 else 0)
+                batch = [first] + self._drain(self.batch_size - 1)
+                if self._write(batch) and os.path.exists(self.spool_path):
+                    self.replay_spool()
+            except Exception:
+                # Keep the thread alive; whatever was not written is in the spool
+                self.writer_errors += 1
+
+    def _replay_when_idle(self):
+        """Replay the spool without waiting for another attempt, at most every SPOOL_RETRY_INTERVAL."""
+        now = time.monotonic()
+        if now < self._next_idle_replay or not os.path.exists(self.spool_path):
+            return
+        self._next_idle_replay = now + SPOOL_RETRY_INTERVAL
+        try:
+            self.replay_spool()
+        except Exception:
+            self.writer_errors += 1
+
+    def _insert(self, attempts: list, report_duplicates: bool = False) -> list:
+        """
+        insert_many the attempts and report the newly stored ones to
+        ``on_written``. Returns the attempts that still need a retry; ones
+        already stored by an earlier try are not retried, and are only
+        reported when ``report_duplicates`` says no earlier try reported them.
+        Raises PyMongoError when nothing could be written.
+        """
+        try:
+            self.collection.insert_many(attempts, ordered=False)
+            failed = {}
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("code") for error in e.details.get("writeErrors", [])}
+        stored = [attempt for i, attempt in enumerate(attempts)
+                  if i not in failed or (report_duplicates and failed[i] == DUPLICATE_KEY)]
+        self.written += len(stored)
+        if stored and self.on_written is not None:
+            try:
+                self.on_written(stored)
+            except Exception:
+                # The attempts themselves are safe; derived data can be rebuilt
+                self.on_written_failures += 1
+        return [attempts[i] for i, code in failed.items() if code != DUPLICATE_KEY]
+
+    def _write(self, batch: list) -> bool:
+        """Write one batch; whatever MongoDB does not take is spooled. Returns True if it took everything."""
+        if not batch:
+            return True
+        try:
+            try:
+                retry = self._insert(batch)
+            except Exception:
+                retry = batch
+            if retry:
+                self.failed_batches += 1
+                self._spool(retry)
+            return not retry
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _spool(self, attempts: list):
+        with self._spool_lock:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for attempt in attempts:
+                    f.write(json_util.dumps(attempt) + "\n")
+        self.spooled += len(attempts)
+
+    def replay_spool(self) -> int:
+        """Move spooled attempts into MongoDB. Returns how many were replayed."""
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return 0
+            with open(self.spool_path, encoding="utf-8") as f:
+                attempts = [json_util.loads(line) for line in f if line.strip()]
+            try:
+                # Spooled attempts were never reported, so ones found already stored are reported now
+                retry = self._insert(attempts, report_duplicates=True) if attempts else []
+            except PyMongoError:
+                return 0
+            os.remove(self.spool_path)
+            if retry:
+                with open(self.spool_path, "w", encoding="utf-8") as f:
+                    for attempt in retry:
+                        f.write(json_util.dumps(attempt) + "\n")
+            return len(attempts) - len(retry)
@@ -0,0 +1,190 @@
+"""
+Benchmark suite for PDF MCQ extraction.
+
+Builds synthetic practice PDFs with PyMuPDF, from 10 to 5,000 questions, and
+times mcqs_test.extract_mcqs_from_pdf on each one with the question cache
+cleared, so every run parses the PDF. Three layouts are covered:
+
+    clean       one question block after another
+    multipage   every question's text is split over a page break
+    malformed   every fifth question lacks its answer, an option or its answer letter
+
+extract_topic_from_filename is timed over a batch of practice filenames.
+For each case the suite records extraction time, questions per second, peak
+Python heap (tracemalloc) and peak RSS, and writes everything to a JSON file
+so parser changes can be compared run over run:
+
+    python benchmarks/bench_extraction.py --output extraction.json
+    python benchmarks/bench_extraction.py --output new.json --compare extraction.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402  PyMuPDF
+from mcq_parser import PARSER_VERSION, extract_topic_from_filename  # noqa: E402
+from mcq_cache import mcq_cache  # noqa: E402
+from mcqs_test import extract_mcqs_from_pdf  # noqa: E402
+
+SIZES = [10, 50, 100, 500, 1000, 2500, 5000]
+LINES_PER_PAGE = 60
+FILENAME_BATCH = 100_000
+
+
+def question_lines(number: int, malformed: bool = False) -> list:
+    lines = [f"{number}. Which of the following statements about topic {number} is correct?",
+             "1. The first statement",
+             "2. The second statement",
+             f"A) Option A for {number}", f"B) Option B for {number}",
+             f"C) Option C for {number}", f"D) Option D for {number}",
+             f"Answer: {'ABCD'[number % 4]}"]
+    if malformed and number % 5 == 0:
+        kind = number // 5 % 3
+        if kind == 0:
+            del lines[-1]                    # no 'Answer:' line
+        elif kind == 1:
+            del lines[5]                     # option C missing
+        else:
+            lines[-1] = "Answer:"            # letter never follows
+    return lines
+
+
+def build_pdf(pages: list) -> bytes:
+    doc = fitz.open()
+    for lines in pages:
+        doc.new_page().insert_text((40, 40), "\n".join(lines), fontsize=8)
+    return doc.tobytes()
+
+
+def clean_pdf(count: int) -> bytes:
+    lines = [line for i in range(1, count + 1) for line in question_lines(i)]
+    return build_pdf([lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)])
+
+
+def multipage_pdf(count: int) -> bytes:
+    """Every question starts at the bottom of one page and finishes on the next."""
+    pages = [[]]
+    for i in range(1, count + 1):
+        lines = question_lines(i)
+        pages[-1] += lines[:2]
+        pages.append(lines[2:])
+    return build_pdf(pages)
+
+
+def malformed_pdf(count: int) -> bytes:
+    lines = [line for i in range(1, count + 1) for line in question_lines(i, malformed=True)]
+    return build_pdf([lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)])
+
+
+LAYOUTS = {
+    "clean": clean_pdf,
+    "multipage": multipage_pdf,
+    "malformed": malformed_pdf,
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def bench_extraction(layout: str, size: int, repeats: int) -> dict:
+    pdf_bytes = LAYOUTS[layout](size)
+    page_count = fitz.open(stream=pdf_bytes, filetype="pdf").page_count
+    timings = []
+    for _ in range(repeats):
+        mcq_cache.clear()
+        start = time.perf_counter()
+        questions = extract_mcqs_from_pdf(io.BytesIO(pdf_bytes))
+        timings.append(time.perf_counter() - start)
+
+    mcq_cache.clear()
+    tracemalloc.start()
+    extract_mcqs_from_pdf(io.BytesIO(pdf_bytes))
+    _, peak_heap = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = min(timings)
+    return {
+        "layout": layout,
+        "questions_in_pdf": size,
+        "questions_found": len(questions),
+        "pages": page_count,
+        "pdf_bytes": len(pdf_bytes),
+        "seconds": seconds,
+        "seconds_all": timings,
+        "questions_per_second": len(questions) / seconds if seconds else 0.0,
+        "peak_heap_mb": peak_heap / 2 ** 20,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_topic_names(count: int) -> dict:
+    filenames = [f"M-{i % 100:02d}_Topic{i}OfTheSyllabus-Part{i % 7}_practicequestions.pdf" for i in range(count)]
+    start = time.perf_counter()
+    for filename in filenames:
+        extract_topic_from_filename(filename)
+    seconds = time.perf_counter() - start
+    return {"filenames": count, "seconds": seconds, "filenames_per_second": count / seconds if seconds else 0.0}
+
+
+def compare(current: dict, baseline: dict):
+    previous = {(r["layout"], r["questions_in_pdf"]): r for r in baseline.get("extraction", [])}
+    print(f"\nChange against {baseline.get('created_at', 'baseline')} (parser v{baseline.get('parser_version')}):")
+    for result in current["extraction"]:
+        old = previous.get((result["layout"], result["questions_in_pdf"]))
+        if old and old["seconds"]:
+            print(f"{result['layout']:<10}{result['questions_in_pdf']:>6}  "
+                  f"time {result['seconds'] / old['seconds'] - 1:+7.1%}  "
+                  f"heap {result['peak_heap_mb'] - old['peak_heap_mb']:+7.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MCQ extraction on synthetic practice PDFs.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Comma-separated question counts")
+    parser.add_argument("--layouts", default=",".join(LAYOUTS), help="Comma-separated layouts to run")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case; the fastest is reported")
+    parser.add_argument("--output", default="extraction_benchmark.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "parser_version": PARSER_VERSION,
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "platform": platform.platform(),
+        "extraction": [],
+    }
+    print(f"{'layout':<10}{'questions':>10}{'found':>7}{'pages':>7}{'ms':>10}{'q/s':>10}{'heap MB':>9}{'RSS MB':>8}")
+    for layout in args.layouts.split(","):
+        for size in [int(s) for s in args.sizes.split(",")]:
+            result = bench_extraction(layout, size, args.repeats)
+            report["extraction"].append(result)
+            print(f"{layout:<10}{size:>10}{result['questions_found']:>7}{result['pages']:>7}"
+                  f"{result['seconds'] * 1000:>10.1f}{result['questions_per_second']:>10.0f}"
+                  f"{result['peak_heap_mb']:>9.2f}{result['peak_rss_mb']:>8.1f}")
+
+    report["topic_names"] = bench_topic_names(FILENAME_BATCH)
+    print(f"\nextract_topic_from_filename: {report['topic_names']['filenames_per_second']:,.0f} filenames/s")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
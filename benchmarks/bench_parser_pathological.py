@@ -0,0 +1,115 @@
+"""
+Pathological-input benchmark for the MCQ parser.
+
+Times the line-oriented parser in mcq_parser against the old DOTALL regex on
+malformed inputs of growing size and checks that the parser's time per line
+stays flat (linear worst case). Also checks that option text wrapping onto a
+line that starts with a year or a decimal parses the same as with the old
+regex. Exits non-zero if either check fails.
+
+    python benchmarks/bench_parser_pathological.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcq_parser import parse_mcqs_from_text  # noqa: E402
+
+# The pattern mcqs_test used before the line parser, kept here for comparison
+LEGACY_PATTERN = re.compile(
+    r'(\d+)\.\s*(.+?)\n'
+    r'A\)\s*(.+?)\n'
+    r'B\)\s*(.+?)\n'
+    r'C\)\s*(.+?)\n'
+    r'D\)\s*(.+?)\n'
+    r'Answer:\s*([ABCD])',
+    re.DOTALL | re.MULTILINE
+)
+
+SIZES = [250, 500, 1000, 2000, 4000]
+# The legacy regex is polynomial of high degree on these inputs (roughly n^5 for
+# missing answers), so it is only timed on tiny inputs to show the growth
+LEGACY_SIZES = [4, 8, 16]
+# Allowed growth of time-per-line between the smallest and largest input
+MAX_PER_LINE_RATIO = 3.0
+
+
+def missing_answers(n):
+    """Well-formed questions whose 'Answer:' line was lost."""
+    return "\n".join(f"{i}. Question {i}?\nA) a\nB) b\nC) c\nD) d" for i in range(1, n + 1))
+
+
+def stray_options(n):
+    """One question whose text contains many stray 'A)' lines and never completes."""
+    return "1. Which of the following?\n" + "\n".join("A) stray option line" for _ in range(n * 5))
+
+
+def numbered_statements(n):
+    """Long runs of numbered statements with no options at all."""
+    return "\n".join(f"{i}. Statement number {i} about the topic." for i in range(1, n * 5 + 1))
+
+
+CASES = {
+    "missing_answers": missing_answers,
+    "stray_options": stray_options,
+    "numbered_statements": numbered_statements,
+}
+
+
+# Option text that wraps onto a line starting with a number must stay part of the option
+WRAPPED_OPTIONS = {
+    "year": "1. When did India become independent?\nA) In August of\n1947. After the war\nB) 1950\nC) 1930\n"
+            "D) 1960\nAnswer: A\n",
+    "decimal": "1. What was the growth rate?\nA) about\n2.5 percent\nB) 5 percent\nC) 7 percent\n"
+               "D) 9 percent\nAnswer: A\n",
+}
+
+
+def check_wrapped_options() -> bool:
+    ok = True
+    for name, text in WRAPPED_OPTIONS.items():
+        errors = []
+        parsed = [(q.question, dict(q.options)["A"], q.answer) for q in parse_mcqs_from_text(text, errors)]
+        legacy = [(m.group(2).strip(), m.group(3).strip(), m.group(7)) for m in LEGACY_PATTERN.finditer(text)]
+        status = "OK" if parsed == legacy and not errors else "FAIL"
+        ok = ok and status == "OK"
+        print(f"wrapped option ({name}): {len(parsed)} parsed, {len(errors)} issues -> {status}")
+    return ok
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    failed = not check_wrapped_options()
+    print()
+    for name, build in CASES.items():
+        print(f"== {name}")
+        print(f"{'':<8}{'size':>6}{'lines':>8}{'ms':>12}{'us/line':>10}")
+        for size in LEGACY_SIZES:
+            text = build(size)
+            line_count = text.count("\n") + 1
+            seconds = time_call(lambda t: list(LEGACY_PATTERN.finditer(t)), text)
+            print(f"{'legacy':<8}{size:>6}{line_count:>8}{seconds * 1000:>12.2f}{seconds / line_count * 1e6:>10.2f}")
+        per_line = []
+        for size in SIZES:
+            text = build(size)
+            line_count = text.count("\n") + 1
+            seconds = min(time_call(parse_mcqs_from_text, text) for _ in range(3))
+            per_line.append(seconds / line_count)
+            print(f"{'parser':<8}{size:>6}{line_count:>8}{seconds * 1000:>12.2f}{per_line[-1] * 1e6:>10.2f}")
+        ratio = max(per_line) / min(per_line)
+        status = "OK" if ratio <= MAX_PER_LINE_RATIO else "FAIL"
+        failed = failed or status == "FAIL"
+        print(f"{name}: time per line varies {ratio:.2f}x across sizes -> {status}\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
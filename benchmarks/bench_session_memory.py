@@ -0,0 +1,118 @@
+"""
+Per-session memory benchmark for a running test.
+
+Builds many mid-test sessions in the dict layout mcqs_test kept in
+st.session_state before TestSession (a shuffled list of question dicts,
+question_timers, question_status, selected_answers and a results list
+carrying the question text) and the same sessions as a ShuffledQuestions view
+of one shared question set plus a TestSession, and reports the bytes each
+layout holds per session with tracemalloc. The shared question set is built
+before measuring, so only per-session memory is counted.
+
+    python benchmarks/bench_session_memory.py --questions 200 --sessions 500
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcq_parser import Question  # noqa: E402
+from mcq_cache import QuestionSet  # noqa: E402
+from test_session import TestSession, ShuffledQuestions, COMPLETED  # noqa: E402
+
+SECONDS_PER_QUESTION = 60
+
+
+def make_questions(count: int) -> QuestionSet:
+    return QuestionSet("bench", (
+        Question(f"Question {i}: which of the following statements about topic {i} is correct?",
+                 tuple((letter, f"Option {letter} for question {i}") for letter in "ABCD"),
+                 "ABCD"[i % 4])
+        for i in range(count)
+    ))
+
+
+def legacy_session(mcqs: QuestionSet, answered: int) -> dict:
+    """The old st.session_state keys of one test with ``answered`` questions submitted."""
+    now = time.time()
+    # Every session used to parse the PDF itself, so it held its own copy of the text
+    shuffled = [{"question": q.question.encode().decode(),
+                 "options": {letter: text.encode().decode() for letter, text in q.options},
+                 "answer": q.answer} for q in mcqs]
+    random.shuffle(shuffled)
+    state = {
+        "mcqs": shuffled,
+        "current_index": answered,
+        "score": 0,
+        "selected_answers": {},
+        "results": [],
+        "question_timers": {i: SECONDS_PER_QUESTION for i in range(len(mcqs))},
+        "question_deadline": now + SECONDS_PER_QUESTION,
+        "question_status": {i: "pending" for i in range(len(mcqs))},
+        "all_questions_processed": False,
+    }
+    for i in range(answered):
+        question = mcqs[i]
+        user_answer = "ABCD"[(i * 7) % 4]
+        state["selected_answers"][i] = user_answer
+        state["question_timers"][i] = SECONDS_PER_QUESTION - (i % 50) - 0.5
+        state["question_status"][i] = "completed"
+        state["results"].append({
+            "question": question.question,
+            "user_answer": user_answer,
+            "correct_answer": question.answer,
+            "is_correct": user_answer == question.answer,
+            "time_taken": (i % 50) + 0.5,
+        })
+        state["score"] += user_answer == question.answer
+    if answered < len(mcqs):
+        state["question_status"][answered] = "active"
+    return state
+
+
+def compact_session(mcqs: QuestionSet, answered: int) -> tuple:
+    now = time.time()
+    session = TestSession(len(mcqs), SECONDS_PER_QUESTION, now)
+    for i in range(answered):
+        session.set_answer(i, "ABCD"[(i * 7) % 4])
+        session.close_question(i, COMPLETED, now + (i % 50) + 0.5)
+    return ShuffledQuestions(mcqs), session
+
+
+def measure(build, mcqs: QuestionSet, sessions: int, answered: int) -> int:
+    """Bytes allocated and still held per session by ``build``."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    held = [build(mcqs, answered) for _ in range(sessions)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del held
+    return total // sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-session memory of the dict and array test state.")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--answered", type=float, default=0.5, help="Fraction of questions already submitted")
+    args = parser.parse_args()
+
+    mcqs = make_questions(args.questions)
+    answered = int(args.questions * args.answered)
+    legacy = measure(legacy_session, mcqs, args.sessions, answered)
+    compact = measure(compact_session, mcqs, args.sessions, answered)
+
+    print(f"{args.sessions} sessions x {args.questions} questions, {answered} answered")
+    print(f"{'layout':<12}{'bytes/session':>15}{'bytes/question':>16}{'all sessions (MB)':>19}")
+    for name, size in (("dicts", legacy), ("compact", compact)):
+        print(f"{name:<12}{size:>15,}{size / args.questions:>16.1f}{size * args.sessions / 2**20:>19.2f}")
+    print(f"The compact layout uses {legacy / compact:.1f}x less memory per session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Concurrent test-taker load simulator for the MCQ test page.
+
+Drives N simulated students through the real mcqs_test.main() flow with
+Streamlit's AppTest, against an in-memory mongomock database holding one
+synthetic practice PDF. Every student is its own AppTest session in this
+process, so they share the question cache and question sets the way
+sessions on one server node do. Each student opens the practice test,
+starts it, answers questions after random think times, lets some questions
+run out, and finishes. Sessions are interleaved on one scheduler in wall
+clock order.
+
+Reported per N: reruns per second, p50/p99 rerun latency, CPU time and peak
+RSS of the process. Needs mongomock in addition to the app's requirements.
+
+    python benchmarks/load_mcqs_test.py --users 1,5,10,25 --questions 10
+"""
+import os
+import sys
+import time
+import heapq
+import random
+import argparse
+import resource
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402  PyMuPDF
+import gridfs  # noqa: E402
+import mongomock  # noqa: E402
+import mongomock.gridfs  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+PRACTICE_FILENAME = "M-01_LoadTestTopic_practicequestions.pdf"
+APP_SCRIPT = "import mcqs_test\nmcqs_test.main()"
+
+
+def make_practice_pdf(question_count: int) -> bytes:
+    doc = fitz.open()
+    lines = []
+    for i in range(1, question_count + 1):
+        lines += [f"{i}. Which statement about item {i} is correct?",
+                  f"A) First choice {i}", f"B) Second choice {i}", f"C) Third choice {i}", f"D) Fourth choice {i}",
+                  f"Answer: {'ABCD'[i % 4]}"]
+    for start in range(0, len(lines), 48):
+        doc.new_page().insert_text((50, 50), "\n".join(lines[start:start + 48]), fontsize=9)
+    return doc.tobytes()
+
+
+def setup_app(question_count: int, seconds_per_question: float):
+    """Point mcqs_test at a fresh mongomock database holding one practice PDF."""
+    mongomock.gridfs.enable_gridfs_integration()
+    db = mongomock.MongoClient().study_resources
+    fs = gridfs.GridFS(db)
+    fs.put(make_practice_pdf(question_count), filename=PRACTICE_FILENAME, metadata={})
+
+    import study_resources
+    study_resources.get_database_connection = lambda: (db, fs)
+    import mcqs_test
+    mcqs_test.get_database_connection = study_resources.get_database_connection
+    mcqs_test.SECONDS_PER_QUESTION = seconds_per_question
+    return db
+
+
+def test_taker(user_id: int, rng: random.Random, seconds_per_question: float, expire_rate: float, record):
+    """
+    One student, as a generator: yields the seconds to wait before its next
+    action and performs the action when resumed. ``record(seconds)`` receives
+    the latency of every rerun.
+    """
+    at = AppTest.from_string(APP_SCRIPT, default_timeout=60)
+    at.session_state["selected_practice_pdf"] = PRACTICE_FILENAME
+    at.session_state["user_session"] = f"load-user-{user_id}"
+
+    def rerun(widget=None):
+        start = time.perf_counter()
+        (widget or at).run()
+        record(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"user {user_id}: {at.exception[0].message}")
+
+    rerun()
+    yield rng.uniform(0.1, 0.5)
+    rerun([b for b in at.button if "Start Test" in b.label][0].click())
+
+    while not at.session_state["test_session"].finished:
+        test_session = at.session_state["test_session"]
+        if rng.random() < expire_rate:
+            # Walk away until the current question runs out; the next rerun expires it
+            yield test_session.remaining_time(test_session.current_index, time.time()) + 0.05
+            rerun()
+            continue
+        yield rng.uniform(0.05, seconds_per_question / 2)
+        question = at.session_state["mcqs"][test_session.current_index]
+        rerun(at.radio[0].set_value(rng.choice(question.options)))
+        yield rng.uniform(0.05, 0.3)
+        submit = [b for b in at.button if "Submit" in b.label]
+        if submit:
+            rerun(submit[0].click())
+
+
+def run_load(db, users: int, seconds_per_question: float, expire_rate: float, seed: int) -> dict:
+    db.test_attempts.delete_many({})
+    latencies = []
+    rng = random.Random(seed)
+    takers = {i: test_taker(i, random.Random(rng.random()), seconds_per_question, expire_rate, latencies.append)
+              for i in range(users)}
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    # (due time, user) heap; every student starts within the first second
+    schedule = [(wall_start + rng.uniform(0, 1), i) for i in takers]
+    heapq.heapify(schedule)
+    while schedule:
+        due, user_id = heapq.heappop(schedule)
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            delay = next(takers[user_id])
+        except StopIteration:
+            continue
+        heapq.heappush(schedule, (time.perf_counter() + delay, user_id))
+    wall_seconds = time.perf_counter() - wall_start
+    # Attempts are written behind the page; wait for them before counting
+    import mcqs_test
+    mcqs_test.get_attempt_writer(db).flush(timeout=30)
+
+    latencies.sort()
+    return {
+        "users": users,
+        "attempts_stored": db.test_attempts.count_documents({}),
+        "reruns": len(latencies),
+        "wall_seconds": wall_seconds,
+        "reruns_per_second": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "cpu_seconds": time.process_time() - cpu_start,
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024),
+    }
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent students taking a practice test.")
+    parser.add_argument("--users", default="1,5,10,25", help="Comma-separated numbers of simultaneous students")
+    parser.add_argument("--questions", type=int, default=10, help="Questions in the practice PDF")
+    parser.add_argument("--seconds-per-question", type=float, default=3.0,
+                        help="Question time limit used for the run (the app default is 60)")
+    parser.add_argument("--expire-rate", type=float, default=0.2, help="Chance a student lets a question run out")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'users':>6}{'reruns':>8}{'reruns/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'CPU s':>8}{'peak RSS MB':>13}{'stored':>8}")
+    db = setup_app(args.questions, args.seconds_per_question)
+    for users in [int(n) for n in args.users.split(",")]:
+        result = run_load(db, users, args.seconds_per_question, args.expire_rate, args.seed)
+        print(f"{result['users']:>6}{result['reruns']:>8}{result['reruns_per_second']:>10.1f}"
+              f"{result['p50_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['cpu_seconds']:>8.2f}"
+              f"{result['peak_rss_mb']:>13.1f}{result['attempts_stored']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Bulk MCQ extraction for onboarding many practice PDFs at once.
+
+Text extraction with PyMuPDF runs in a process pool. Every GridFS file is
+split into page ranges so a single very large PDF is spread over several
+workers; each worker opens the PDF with fitz itself. The page texts are
+merged back in page order and run through the line parser, so results are
+identical to a single-process parse, and then written to the question bank.
+
+    python bulk_extract.py --subject Geography --workers 8
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fitz  # PyMuPDF
+import gridfs
+from pymongo import MongoClient
+from bson import ObjectId
+from mcq_parser import parse_mcqs_from_pages
+from mcq_cache import compute_content_hash
+from question_bank import store_question_bank_entry, answer_key_version, corrected_answers
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+DEFAULT_PAGES_PER_CHUNK = 25
+
+# Per-worker-process state; each worker opens its own MongoClient after the fork
+_worker_fs = None
+_worker_pdf = (None, None)  # (file_id, bytes) of the last PDF read, reused by later page ranges
+
+
+def _init_worker(mongo_uri: str, db_name: str):
+    global _worker_fs
+    if _worker_fs is None:
+        _worker_fs = gridfs.GridFS(MongoClient(mongo_uri)[db_name])
+
+
+def _read_pdf(file_id: str) -> bytes:
+    global _worker_pdf
+    if _worker_pdf[0] != file_id:
+        _worker_pdf = (file_id, _worker_fs.get(ObjectId(file_id)).read())
+    return _worker_pdf[1]
+
+
+def inspect_pdf(file_id: str) -> dict:
+    """Worker task: page count and content hash of one GridFS file."""
+    start = time.perf_counter()
+    pdf_bytes = _read_pdf(file_id)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        page_count = doc.page_count
+    return {
+        "file_id": file_id,
+        "page_count": page_count,
+        "content_hash": compute_content_hash(pdf_bytes),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def extract_page_range(file_id: str, start_page: int, stop_page: int) -> dict:
+    """Worker task: plain text of pages [start_page, stop_page) of one GridFS file."""
+    start = time.perf_counter()
+    pdf_bytes = _read_pdf(file_id)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        texts = [doc[i].get_text("text") for i in range(start_page, stop_page)]
+    return {
+        "file_id": file_id,
+        "start_page": start_page,
+        "texts": texts,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def split_pages(page_count: int, pages_per_chunk: int) -> list:
+    return [(start, min(start + pages_per_chunk, page_count)) for start in range(0, page_count, pages_per_chunk)]
+
+
+def bulk_extract(db, file_docs: list, workers: int = None, pages_per_chunk: int = DEFAULT_PAGES_PER_CHUNK,
+                 write_bank: bool = True, progress=None, mongo_uri: str = MONGO_URI, db_name: str = DB_NAME):
+    """
+    Extract questions from many fs.files documents in parallel.
+
+    ``progress(done, total, file_result)`` is called as each file finishes.
+    A file that cannot be read or parsed (corrupt PDF, missing GridFS chunk)
+    gets a result with its ``error`` and does not stop the other files.
+    Returns (file_results, summary) where file_results are in completion order.
+    """
+    names = {str(doc["_id"]): doc.get("filename") for doc in file_docs}
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    file_results = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mongo_uri, db_name)) as pool:
+        def record(result):
+            file_results.append(result)
+            if progress is not None:
+                progress(len(file_results), len(names), result)
+
+        def fail_file(file_id, error, worker_seconds=0.0, started=None):
+            info = inspected.get(file_id, {})
+            record({
+                "file_id": file_id,
+                "filename": names[file_id],
+                "pages": info.get("page_count", 0),
+                "chunks": 0,
+                "questions": 0,
+                "parse_errors": 0,
+                "worker_seconds": worker_seconds,
+                "wall_seconds": time.perf_counter() - started if started else 0.0,
+                "error": f"{type(error).__name__}: {error}",
+            })
+
+        inspected = {}
+        inspect_futures = {pool.submit(inspect_pdf, file_id): file_id for file_id in names}
+        for future in as_completed(inspect_futures):
+            try:
+                info = future.result()
+            except Exception as e:
+                fail_file(inspect_futures[future], e)
+                continue
+            inspected[info["file_id"]] = info
+
+        def finish_file(file_id, state):
+            try:
+                result = merge_file(file_id, state)
+            except Exception as e:
+                fail_file(file_id, e, state["worker_seconds"], state["started"])
+                return
+            record(result)
+
+        def merge_file(file_id, state):
+            info = inspected[file_id]
+            texts = [text for c in sorted(state["chunks"], key=lambda c: c["start_page"]) for text in c["texts"]]
+            errors = []
+            questions = parse_mcqs_from_pages(texts, errors=errors)
+            if write_bank:
+                # A regraded file keeps its corrected answers rather than the ones printed in the PDF
+                key_version = answer_key_version(
+                    db.fs.files.find_one({"_id": ObjectId(file_id)}, {"metadata.answer_key_version": 1}) or {})
+                if key_version:
+                    questions = corrected_answers(db, questions)
+                store_question_bank_entry(db, ObjectId(file_id), info["content_hash"], questions, errors, names[file_id],
+                                          key_version)
+                db.fs.files.update_one({"_id": ObjectId(file_id)}, {"$set": {"metadata.content_hash": info["content_hash"]}})
+            result = {
+                "file_id": file_id,
+                "filename": names[file_id],
+                "pages": info["page_count"],
+                "chunks": len(state["chunks"]),
+                "questions": len(questions),
+                "parse_errors": len(errors),
+                "worker_seconds": state["worker_seconds"],
+                "wall_seconds": time.perf_counter() - state["started"],
+                "error": None,
+            }
+            return result
+
+        pending = {}
+        futures = {}
+        for file_id, info in inspected.items():
+            ranges = split_pages(info["page_count"], pages_per_chunk)
+            state = {"remaining": len(ranges), "chunks": [], "worker_seconds": info["seconds"],
+                     "started": time.perf_counter()}
+            if not ranges:
+                finish_file(file_id, state)
+                continue
+            pending[file_id] = state
+            futures.update({pool.submit(extract_page_range, file_id, start, stop): file_id for start, stop in ranges})
+
+        # Merge each file as soon as its last page range arrives
+        for future in as_completed(futures):
+            file_id = futures[future]
+            if file_id not in pending:
+                continue  # an earlier page range of this file already failed
+            try:
+                chunk = future.result()
+            except Exception as e:
+                state = pending.pop(file_id)
+                fail_file(file_id, e, state["worker_seconds"], state["started"])
+                continue
+            state = pending[file_id]
+            state["chunks"].append(chunk)
+            state["worker_seconds"] += chunk["seconds"]
+            state["remaining"] -= 1
+            if state["remaining"] == 0:
+                finish_file(chunk["file_id"], pending.pop(chunk["file_id"]))
+
+    wall_seconds = time.perf_counter() - wall_start
+    parsed = [r for r in file_results if r["error"] is None]
+    total_pages = sum(r["pages"] for r in parsed)
+    total_questions = sum(r["questions"] for r in parsed)
+    summary = {
+        "files": len(parsed),
+        "failed_files": len(file_results) - len(parsed),
+        "pages": total_pages,
+        "questions": total_questions,
+        "parse_errors": sum(r["parse_errors"] for r in file_results),
+        "wall_seconds": wall_seconds,
+        "worker_seconds": sum(r["worker_seconds"] for r in file_results),
+        "parent_cpu_seconds": time.process_time() - cpu_start,
+        "files_per_second": len(parsed) / wall_seconds if wall_seconds else 0.0,
+        "pages_per_second": total_pages / wall_seconds if wall_seconds else 0.0,
+        "questions_per_second": total_questions / wall_seconds if wall_seconds else 0.0,
+    }
+    return file_results, summary
+
+
+def find_practice_files(db, subject: str = None, topic: str = None) -> list:
+    query = {"filename": {"$regex": "practicequestions\\.pdf$"}}
+    if subject:
+        query["metadata.subject"] = subject
+    if topic:
+        query["metadata.topic"] = topic
+    return list(db.fs.files.find(query, {"filename": 1}))
+
+
+def print_progress(done: int, total: int, result: dict):
+    if result["error"]:
+        print(f"[{done}/{total}] {result['filename']}: FAILED: {result['error']}")
+        return
+    print(f"[{done}/{total}] {result['filename']}: {result['questions']} questions, "
+          f"{result['parse_errors']} parse issues, {result['pages']} pages in {result['chunks']} chunks, "
+          f"{result['wall_seconds']:.2f}s wall / {result['worker_seconds']:.2f}s worker")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse practice PDFs from GridFS into the question bank in parallel.")
+    parser.add_argument("--subject", help="Only files for this subject")
+    parser.add_argument("--topic", help="Only files for this topic")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    parser.add_argument("--pages-per-chunk", type=int, default=DEFAULT_PAGES_PER_CHUNK,
+                        help="Split PDFs into page ranges of this size")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report without writing the question bank")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    file_docs = find_practice_files(db, args.subject, args.topic)
+    if not file_docs:
+        print("No practice PDFs found.")
+        return
+
+    print(f"Extracting {len(file_docs)} practice PDFs with {args.workers} workers...")
+    file_results, summary = bulk_extract(db, file_docs, args.workers, args.pages_per_chunk, not args.dry_run,
+                              print_progress, args.mongo_uri, args.db_name)
+    print()
+    print(f"Files:     {summary['files']} ({summary['failed_files']} failed)")
+    print(f"Pages:     {summary['pages']}")
+    print(f"Questions: {summary['questions']} ({summary['parse_errors']} parse issues)")
+    print(f"Wall time: {summary['wall_seconds']:.2f}s (worker time {summary['worker_seconds']:.2f}s, "
+          f"parent CPU {summary['parent_cpu_seconds']:.2f}s)")
+    print(f"Throughput: {summary['files_per_second']:.2f} files/s, {summary['pages_per_second']:.1f} pages/s, "
+          f"{summary['questions_per_second']:.1f} questions/s")
+    failed = [r for r in file_results if r["error"]]
+    if failed:
+        print("\nFailed files:")
+        for result in failed:
+            print(f"  {result['filename']}: {result['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 import streamlit as st
 from study_resources import get_database_connection
+from attempt_counters import delete_attempt_counters
+from progress_rollups import rebuild_rollups
+from score_histograms import rebuild_score_histograms
+from leaderboards import rebuild_leaderboards
+from question_stats import rebuild_question_stats
 
 def delete_test_records_for_user(username: str):
     db, fs = get_database_connection()
@@ -13,7 +18,15 @@ def delete_test_records_for_user(username: str):
     confirm = st.checkbox("I confirm that I want to delete all test records for this user", key="confirm_delete")
     if confirm:
         if st.button("Delete All Test Records", key="delete_records_btn"):
+            topic_names = collection.distinct("topic_name", {"username": username})
+            subjects = collection.distinct("subject", {"username": username})
             result = collection.delete_many({"username": username})
+            delete_attempt_counters(db, username)  # numbering starts again at 1, as before
+            rebuild_rollups(db, username)
+            rebuild_score_histograms(db, topic_names)
+            rebuild_leaderboards(db, "topic", topic_names)
+            rebuild_leaderboards(db, "subject", subjects)
+            rebuild_question_stats(db, topic_names)
             st.success(f"Deleted {result.deleted_count} test record(s) for user '{username}'.")
     else:
         st.warning("Check the box above to confirm deletion.")
@@ -0,0 +1,219 @@
+"""
+Materialized top-K leaderboards per topic and per subject.
+
+``leaderboards`` holds one small document per board:
+
+    scope ("topic" or "subject"), name, version,
+    entries: [{username, score_percent, time_per_question, attempt_number, timestamp}]  (best LEADERBOARD_SIZE)
+
+Each user appears once, with their best attempt: highest score first, then
+fastest average time per question. Boards are merged as attempts are stored,
+so a leaderboard view is a single find_one. Concurrent writers are resolved
+with a version check: a merge that lost the race re-reads the board and
+tries again. Boards are rebuilt from test_attempts with:
+
+    python leaderboards.py --rebuild
+
+Attempts stored before they recorded their subject are missing from the
+subject boards until it is filled in from the practice PDF metadata:
+
+    python leaderboards.py --backfill-subjects
+"""
+import argparse
+from collections import defaultdict
+from pymongo import MongoClient, ASCENDING, UpdateOne, UpdateMany
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from progress_rollups import score_percent
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+LEADERBOARD_SIZE = 10
+SCOPES = ("topic", "subject")
+# Attempt field that names the board of each scope
+SCOPE_FIELDS = {"topic": "topic_name", "subject": "subject"}
+MAX_MERGE_RETRIES = 5
+
+
+def ensure_leaderboard_indexes(db):
+    db.leaderboards.create_index([("scope", ASCENDING), ("name", ASCENDING)], unique=True)
+
+
+def leaderboard_entry(attempt: dict) -> dict:
+    return {
+        "username": attempt.get("username"),
+        "score_percent": score_percent(attempt),
+        "time_per_question": attempt.get("average_time_per_question") or 0,
+        "attempt_number": attempt.get("attempt_number", 1),
+        "timestamp": attempt.get("timestamp"),
+    }
+
+
+def rank_key(entry: dict):
+    return -entry["score_percent"], entry["time_per_question"]
+
+
+def merge_entries(entries: list, candidates: list, size: int = LEADERBOARD_SIZE) -> list:
+    """The best ``size`` entries of both lists, keeping only each user's best."""
+    best = {}
+    for entry in entries + candidates:
+        current = best.get(entry["username"])
+        if current is None or rank_key(entry) < rank_key(current):
+            best[entry["username"]] = entry
+    return sorted(best.values(), key=rank_key)[:size]
+
+
+def merge_leaderboard(db, scope: str, name: str, candidates: list) -> bool:
+    """
+    Fold candidate entries into one board with compare-and-set on its
+    version. Returns False when the board did not change.
+    """
+    for _ in range(MAX_MERGE_RETRIES):
+        board = db.leaderboards.find_one({"scope": scope, "name": name}, {"entries": 1, "version": 1})
+        entries = board["entries"] if board else []
+        merged = merge_entries(entries, candidates)
+        if merged == entries:
+            return False
+        try:
+            if board is None:
+                db.leaderboards.insert_one({"scope": scope, "name": name, "version": 1, "entries": merged})
+                return True
+            result = db.leaderboards.update_one({"_id": board["_id"], "version": board.get("version", 0)},
+                                                {"$set": {"entries": merged}, "$inc": {"version": 1}})
+            if result.modified_count:
+                return True
+        except DuplicateKeyError:
+            pass  # another writer created the board first
+    raise OperationFailure(f"Could not update the {scope} leaderboard {name!r} after {MAX_MERGE_RETRIES} tries")
+
+
+def apply_leaderboards(db, attempts: list):
+    """Merge newly stored attempts into their topic and subject boards, one merge per board."""
+    candidates = defaultdict(list)
+    for attempt in attempts:
+        entry = leaderboard_entry(attempt)
+        for scope, field in SCOPE_FIELDS.items():
+            if attempt.get(field):
+                candidates[scope, attempt[field]].append(entry)
+    for (scope, name), entries in candidates.items():
+        merge_leaderboard(db, scope, name, entries)
+
+
+def load_leaderboard(db, scope: str, name: str):
+    return db.leaderboards.find_one({"scope": scope, "name": name}, {"_id": 0})
+
+
+def leaderboard_names(db, scope: str) -> list:
+    return sorted(db.leaderboards.distinct("name", {"scope": scope}))
+
+
+def leaderboard_pipeline(field: str, match: dict) -> list:
+    """Each board's best attempt per user, ranked and cut to LEADERBOARD_SIZE, inside MongoDB."""
+    ranking = {"score_percent": -1, "time_per_question": 1}
+    return [
+        {"$match": {"$and": [match, {field: {"$nin": [None, ""]}}]}},
+        {"$project": {
+            "name": f"${field}",
+            "username": 1,
+            "score_percent": {"$multiply": [
+                {"$divide": [{"$ifNull": ["$total_score", 0]},
+                             {"$cond": [{"$gt": ["$total_questions", 0]}, "$total_questions", 1]}]},
+                100
+            ]},
+            "time_per_question": {"$ifNull": ["$average_time_per_question", 0]},
+            "attempt_number": {"$ifNull": ["$attempt_number", 1]},
+            "timestamp": 1,
+        }},
+        {"$sort": ranking},
+        {"$group": {
+            "_id": {"name": "$name", "username": "$username"},
+            "score_percent": {"$first": "$score_percent"},
+            "time_per_question": {"$first": "$time_per_question"},
+            "attempt_number": {"$first": "$attempt_number"},
+            "timestamp": {"$first": "$timestamp"},
+        }},
+        {"$sort": ranking},
+        {"$group": {
+            "_id": "$_id.name",
+            "entries": {"$push": {
+                "username": "$_id.username",
+                "score_percent": "$score_percent",
+                "time_per_question": "$time_per_question",
+                "attempt_number": "$attempt_number",
+                "timestamp": "$timestamp",
+            }},
+        }},
+        {"$project": {"_id": 0, "name": "$_id", "entries": {"$slice": ["$entries", LEADERBOARD_SIZE]}}},
+    ]
+
+
+def rebuild_leaderboards(db, scope: str = None, names: list = None) -> int:
+    """
+    Recompute boards from test_attempts, for both scopes or one, and for
+    every board of a scope or just the named ones. Boards are upserted with
+    their version bumped, so a merge that read the old board retries against
+    the rebuilt one; boards left without attempts are removed. Returns the
+    number of boards written.
+    """
+    ensure_leaderboard_indexes(db)
+    written = 0
+    for board_scope in ([scope] if scope else SCOPES):
+        field = SCOPE_FIELDS[board_scope]
+        match = {} if names is None else {field: {"$in": list(names)}}
+        boards = list(db.test_attempts.aggregate(leaderboard_pipeline(field, match), allowDiskUse=True))
+        if boards:
+            db.leaderboards.bulk_write([
+                UpdateOne({"scope": board_scope, "name": board["name"]},
+                          {"$set": {"entries": board["entries"]}, "$inc": {"version": 1}}, upsert=True)
+                for board in boards
+            ], ordered=False)
+        stale = {"scope": board_scope, "name": {"$nin": [board["name"] for board in boards]}}
+        if names is not None:
+            stale = {"$and": [stale, {"name": {"$in": list(names)}}]}
+        db.leaderboards.delete_many(stale)
+        written += len(boards)
+    return written
+
+
+def backfill_attempt_subjects(db) -> int:
+    """
+    Record subject and subsection on attempts stored before they were saved,
+    from the practice PDF metadata, then rebuild the affected subject boards.
+    Returns the number of attempts updated.
+    """
+    from progress_analytics import practice_topic_subjects
+    mapping = practice_topic_subjects(db)
+    missing = {"subject": {"$in": [None, ""]}}
+    topic_names = [t for t in db.test_attempts.distinct("topic_name", missing) if t in mapping]
+    if not topic_names:
+        return 0
+    result = db.test_attempts.bulk_write([
+        UpdateMany({**missing, "topic_name": topic_name},
+                  {"$set": {"subject": mapping[topic_name][0], "subsection": mapping[topic_name][1]}})
+        for topic_name in topic_names
+    ], ordered=False)
+    rebuild_leaderboards(db, "subject", {mapping[topic_name][0] for topic_name in topic_names})
+    return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-topic and per-subject leaderboards.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute leaderboards from test_attempts")
+    parser.add_argument("--scope", choices=SCOPES, help="Only rebuild topic or subject boards")
+    parser.add_argument("--backfill-subjects", action="store_true",
+                        help="Record the subject of older attempts and rebuild the subject boards")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    if args.backfill_subjects:
+        print(f"Recorded the subject of {backfill_attempt_subjects(db)} attempts.")
+    if args.rebuild:
+        print(f"Rebuilt {rebuild_leaderboards(db, args.scope)} leaderboards.")
+    if not (args.rebuild or args.backfill_subjects):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
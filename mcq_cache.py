@@ -0,0 +1,143 @@
+import os
+import sys
+import hashlib
+import weakref
+import threading
+from collections import OrderedDict
+from mcq_parser import extract_mcqs_from_bytes
+
+# Byte budget for parsed questions kept in this process (override with MCQ_CACHE_MAX_BYTES)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def estimate_questions_size(questions) -> int:
+    """Rough in-memory size of a parsed question set, used against the byte budget."""
+    size = sys.getsizeof(tuple(questions))
+    for q in questions:
+        size += sys.getsizeof(q) + sys.getsizeof(q.question) + sys.getsizeof(q.answer)
+        size += sys.getsizeof(q.options)
+        for letter, text in q.options:
+            size += sys.getsizeof(letter) + sys.getsizeof(text)
+    return size
+
+
+class QuestionSet:
+    """
+    The parsed questions of one practice PDF version, read-only and shared by
+    every session in the process. Sessions keep a reference to it plus their
+    own order of indices instead of a copy of the questions.
+    """
+
+    __slots__ = ("key", "questions", "__weakref__")
+
+    def __init__(self, key: str, questions):
+        self.key = key
+        self.questions = tuple(questions)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __getitem__(self, index):
+        return self.questions[index]
+
+    def __iter__(self):
+        return iter(self.questions)
+
+
+# Every QuestionSet still referenced by a cache entry or a running test, by content hash.
+# Weak, so a set evicted from the cache lives exactly as long as the tests using it.
+_question_sets = weakref.WeakValueDictionary()
+_question_sets_lock = threading.Lock()
+
+
+def intern_question_set(key: str, questions) -> QuestionSet:
+    """The one shared QuestionSet for ``key``; ``questions`` is only used if none is alive."""
+    with _question_sets_lock:
+        question_set = _question_sets.get(key)
+        if question_set is None:
+            question_set = questions if isinstance(questions, QuestionSet) else QuestionSet(key, questions)
+            _question_sets[key] = question_set
+        return question_set
+
+
+def find_question_set(key: str):
+    """The live QuestionSet for ``key`` (even one already evicted from the cache), or None."""
+    with _question_sets_lock:
+        return _question_sets.get(key)
+
+
+class MCQCache:
+    """Thread-safe LRU of parsed question sets keyed by PDF content hash, bounded by bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (questions, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, questions) -> QuestionSet:
+        questions = intern_question_set(key, questions)
+        size = estimate_questions_size(questions)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            # An entry larger than the whole budget is returned to the caller but never cached
+            if size > self.max_bytes:
+                return questions
+            self._entries[key] = (questions, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return questions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Module-level so every Streamlit session in this process shares it
+mcq_cache = MCQCache(int(os.getenv("MCQ_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+
+
+def compute_content_hash(pdf_bytes: bytes) -> str:
+    """sha256 of the raw PDF bytes; the cache key and the question bank staleness check."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def extract_mcqs_cached(pdf_bytes: bytes, content_hash: str = None, progress=None) -> QuestionSet:
+    """Cached extract_mcqs_from_bytes. Pass content_hash when it is already known to skip hashing."""
+    key = content_hash or compute_content_hash(pdf_bytes)
+    questions = mcq_cache.get(key)
+    if questions is None:
+        questions = mcq_cache.put(key, extract_mcqs_from_bytes(pdf_bytes, progress))
+    return questions
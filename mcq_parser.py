@@ -0,0 +1,283 @@
+import re
+from typing import Iterator, NamedTuple, Optional
+import fitz  # PyMuPDF
+
+# Bump this whenever the parsing rules change so stored question banks are rebuilt
+PARSER_VERSION = 3
+
+# Each pattern is anchored and applied to a single line, so matching is linear
+# in the line length and never backtracks across the document.
+QUESTION_START = re.compile(r'\s*(\d+)\.\s*(.*)')
+# While reading options, only "<n>. " with whitespace after the dot can start the next question,
+# so wrapped option text such as "1947. After the war" or "2.5 percent" stays part of the option
+NEXT_QUESTION_START = re.compile(r'\s*(\d+)\.(?:\s+|$)(.*)')
+OPTION_LINE = re.compile(r'\s*([ABCD])\)\s*(.*)')
+ANSWER_LINE = re.compile(r'\s*Answer:\s*([ABCD])?')
+ANSWER_LETTER = re.compile(r'\s*([ABCD])\b')
+
+OPTION_LETTERS = ("A", "B", "C", "D")
+
+# Parser states
+SEEK = "seek"                          # between questions, waiting for "<n>. ..."
+QUESTION = "question"                  # collecting question text until "A)"
+OPTION = "option"                      # collecting text of the current option
+ANSWER_LETTER_NEXT = "answer_letter"   # saw a bare "Answer:", the letter is on the next line
+
+
+class Question(NamedTuple):
+    """An immutable parsed MCQ. ``options`` is a tuple of (letter, text) pairs in A-D order."""
+    question: str
+    options: tuple
+    answer: str
+
+    def to_dict(self) -> dict:
+        return {"question": self.question, "options": dict(self.options), "answer": self.answer}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Question":
+        return cls(data["question"], tuple(data["options"].items()), data["answer"])
+
+
+class ParseIssue(NamedTuple):
+    """A question that was started but could not be parsed."""
+    question_number: Optional[str]
+    page: int
+    message: str
+
+    def to_dict(self) -> dict:
+        return {"question_number": self.question_number, "page": self.page, "message": self.message}
+
+
+class MCQLineParser:
+    """
+    Single-pass, line-oriented state machine for the practice question format:
+
+        1. Question text (may span lines)
+        A) option
+        B) option
+        C) option
+        D) option
+        Answer: C
+
+    Every line is looked at once with anchored patterns, so the worst case is
+    linear in the input. Malformed questions are dropped and recorded in
+    ``errors`` with the page they started on, and parsing resumes at the next
+    question.
+    """
+
+    def __init__(self):
+        self.errors = []
+        self._reset()
+
+    def _reset(self):
+        self.state = SEEK
+        self.number = None
+        self.page = 0
+        self.question_lines = []
+        self.options = []  # list of (letter, [lines])
+
+    def _fail(self, message: str):
+        self.errors.append(ParseIssue(self.number, self.page, message))
+        self._reset()
+
+    def _start(self, match, page: int):
+        self._reset()
+        self.state = QUESTION
+        self.number = match.group(1)
+        self.page = page
+        if match.group(2).strip():
+            self.question_lines.append(match.group(2).strip())
+
+    def _emit(self, answer: str) -> Question:
+        question = Question(
+            "\n".join(self.question_lines),
+            tuple((letter, "\n".join(lines)) for letter, lines in self.options),
+            answer,
+        )
+        self._reset()
+        return question
+
+    def _resync_after_missing_answer(self, line: str, page: int) -> Optional[Question]:
+        """Drop the current question and restart at the question start read into option D, if any."""
+        wrapped = self.options[-1][1]
+        starts = [i for i, text in enumerate(wrapped) if NEXT_QUESTION_START.match(text)]
+        # Prefer a number after the current one; wrapped text may also start with a number
+        later = [i for i in starts if int(NEXT_QUESTION_START.match(wrapped[i]).group(1)) > int(self.number)]
+        self._fail("missing 'Answer:' line")
+        if not starts:
+            return None
+        first = (later or starts)[0]
+        self._start(NEXT_QUESTION_START.match(wrapped[first]), page)
+        self.question_lines.extend(wrapped[first + 1:])
+        return self.feed_line(line, page)
+
+    def feed_line(self, line: str, page: int) -> Optional[Question]:
+        """Consume one line of text; returns a Question when this line completes one."""
+        stripped = line.strip()
+        if not stripped:
+            return None
+
+        if self.state == SEEK:
+            match = QUESTION_START.match(line)
+            if match:
+                self._start(match, page)
+            return None
+
+        if self.state == ANSWER_LETTER_NEXT:
+            match = ANSWER_LETTER.match(line)
+            if match:
+                return self._emit(match.group(1))
+            self._fail("'Answer:' is not followed by A, B, C or D")
+            return self.feed_line(line, page)
+
+        answer = ANSWER_LINE.match(line)
+        if answer:
+            if len(self.options) < len(OPTION_LETTERS):
+                self._fail(f"'Answer:' found after only {len(self.options)} of 4 options")
+                return None
+            if answer.group(1):
+                return self._emit(answer.group(1))
+            self.state = ANSWER_LETTER_NEXT
+            return None
+
+        expected = OPTION_LETTERS[len(self.options)] if len(self.options) < len(OPTION_LETTERS) else None
+        option = OPTION_LINE.match(line)
+        if option and option.group(1) == expected:
+            self.state = OPTION
+            text = option.group(2).strip()
+            self.options.append((expected, [text] if text else []))
+            return None
+
+        if option and expected is None and option.group(1) == OPTION_LETTERS[0]:
+            # A fresh "A)" after all four options: the answer line is missing and the
+            # next question's text has been read as wrapped text of option D
+            return self._resync_after_missing_answer(line, page)
+
+        if self.state == OPTION:
+            # The next question's number while reading options means this question never finished;
+            # any other numbered line is wrapped option text
+            start = NEXT_QUESTION_START.match(line)
+            if start and int(start.group(1)) == int(self.number) + 1:
+                self._fail("missing 'Answer:' line" if expected is None else f"missing option {expected})")
+                self._start(start, page)
+                return None
+            self.options[-1][1].append(stripped)
+            return None
+
+        # QUESTION state: numbered statements inside a question are part of its text
+        self.question_lines.append(stripped)
+        return None
+
+    def finish(self):
+        """Record the question still being read when the document ends, if any."""
+        if self.state != SEEK:
+            self._fail("document ended before the question was complete")
+
+
+def iter_mcqs_from_lines(lines, page: int = 1, parser: MCQLineParser = None) -> Iterator[Question]:
+    parser = parser or MCQLineParser()
+    for line in lines:
+        question = parser.feed_line(line, page)
+        if question is not None:
+            yield question
+
+
+def parse_mcqs_from_text(text: str, errors: list = None) -> tuple:
+    """Parse numbered questions with A-D options and an 'Answer:' line out of raw text."""
+    parser = MCQLineParser()
+    questions = tuple(iter_mcqs_from_lines(text.splitlines(), parser=parser))
+    parser.finish()
+    if errors is not None:
+        errors.extend(parser.errors)
+    return questions
+
+
+def parse_mcqs_from_pages(page_texts, first_page: int = 1, errors: list = None) -> tuple:
+    """Parse already-extracted page texts in order, as if they were one document."""
+    parser = MCQLineParser()
+    questions = []
+    for page_number, text in enumerate(page_texts, start=first_page):
+        questions.extend(iter_mcqs_from_lines(text.splitlines(), page_number, parser))
+    parser.finish()
+    if errors is not None:
+        errors.extend(parser.errors)
+    return tuple(questions)
+
+
+def iter_mcqs_from_pdf_bytes(pdf_bytes: bytes, progress=None, errors: list = None) -> Iterator[Question]:
+    """
+    Yield questions page by page as soon as each one is complete.
+
+    The parser keeps its state across pages, so a question split over a page
+    break still parses and only one page of text is held in memory.
+    ``progress``, if given, is called as
+    ``progress(page_number, page_count, questions_so_far)`` after every page.
+    Parse issues are appended to ``errors`` when a list is passed.
+    Raises if the PDF cannot be opened.
+    """
+    parser = MCQLineParser()
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        page_count = doc.page_count
+        found = 0
+        for page_number, page in enumerate(doc, start=1):
+            for question in iter_mcqs_from_lines(page.get_text("text").splitlines(), page_number, parser):
+                found += 1
+                yield question
+            if progress is not None:
+                progress(page_number, page_count, found)
+        parser.finish()
+    finally:
+        doc.close()
+        if errors is not None:
+            errors.extend(parser.errors)
+
+
+def extract_mcqs_from_bytes(pdf_bytes: bytes, progress=None, errors: list = None) -> tuple:
+    """Extract MCQs from raw PDF bytes. Raises if the PDF cannot be opened."""
+    return tuple(iter_mcqs_from_pdf_bytes(pdf_bytes, progress, errors))
+
+
+def extract_topic_from_filename(filename: str) -> str:
+    """
+    Extracts the topic name from a filename like:
+    M-01_IntroductiontoStatisticalMethodsofAnalysis_practicequestions.pdf
+
+    Steps:
+    1. Remove the file extension (.pdf).
+    2. Replace hyphens with underscores to standardize separators.
+    3. Split on underscores.
+    4. Confirm the first two segments are "M" and digits (e.g., "01").
+    5. Everything from the third segment up to the last segment (which should be 'practicequestions')
+       is joined to form the topic.
+    """
+    # 1. Strip off the .pdf extension
+    if filename.lower().endswith(".pdf"):
+        filename = filename[:-4]  # Remove last 4 chars (.pdf)
+
+    # 2. Replace hyphens with underscores
+    normalized = filename.replace('-', '_')
+
+    # 3. Split on underscores
+    parts = normalized.split('_')
+    # Example:
+    #   "M_01_IntroductiontoStatisticalMethodsofAnalysis_practicequestions"
+    #   parts => ["M", "01", "IntroductiontoStatisticalMethodsofAnalysis", "practicequestions"]
+
+    # 4. Basic validation:
+    #    - The first part should be "M" (ignoring case).
+    #    - The second part should be numeric (the module number).
+    #    - The last part is "practicequestions".
+    #    - Everything in between is the actual topic name.
+    if len(parts) < 4:
+        return "Unknown Topic"
+
+    if parts[0].upper() == "M" and parts[-1].lower() == "practicequestions" and parts[1].isdigit():
+        # 5. Join all segments from index 2 up to the one before the last
+        #    to form the topic name.
+        topic_parts = parts[2:-1]  # everything between the module number and 'practicequestions'
+        topic = "_".join(topic_parts)  # join them with underscores if needed
+        topic = topic.replace('_', ' ')  # convert underscores to spaces
+        return topic.title().strip()
+
+    return "Unknown Topic"
@@ -1,97 +1,70 @@
-import io
 import streamlit as st
-import fitz  # PyMuPDF
+import os
 import time
-import re
-import random
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime
 from session_manager import navigate_to  # Import navigation function
 from study_resources import get_database_connection
+from mcq_cache import extract_mcqs_cached
+from mcq_parser import extract_topic_from_filename
+from question_bank import get_practice_questions
+from timed_test_component import timed_test, apply_client_submission
+from test_session import TestSession, ShuffledQuestions, COMPLETED
+from attempt_writer import AttemptWriter, DEFAULT_MAX_QUEUE, DEFAULT_SPOOL_PATH
+from attempt_counters import ensure_attempt_counter_indexes, claim_attempt_number
+from attempt_store import question_id, compact_results, ensure_attempt_indexes
+from progress_rollups import ensure_rollup_indexes, apply_attempt_rollups
+from score_histograms import ensure_histogram_indexes, apply_score_histograms
+from leaderboards import ensure_leaderboard_indexes, apply_leaderboards
+from question_stats import ensure_question_stats_indexes, apply_question_stats
+SECONDS_PER_QUESTION = 60
 # st.set_page_config(
 #     page_title="Online MCQ Test Platform",
 #     page_icon="📝",
 #     layout="wide"
 # )
-def extract_topic_from_filename(filename: str) -> str:
-    """
-    Extracts the topic name from a filename like:
-    M-01_IntroductiontoStatisticalMethodsofAnalysis_practicequestions.pdf
-
-    Steps:
-    1. Remove the file extension (.pdf).
-    2. Replace hyphens with underscores to standardize separators.
-    3. Split on underscores.
-    4. Confirm the first two segments are "M" and digits (e.g., "01").
-    5. Everything from the third segment up to the last segment (which should be 'practicequestions')
-       is joined to form the topic.
-    """
-    # 1. Strip off the .pdf extension
-    if filename.lower().endswith(".pdf"):
-        filename = filename[:-4]  # Remove last 4 chars (.pdf)
-
-    # 2. Replace hyphens with underscores
-    normalized = filename.replace('-', '_')
-
-    # 3. Split on underscores
-    parts = normalized.split('_')
-    # Example:
-    #   "M_01_IntroductiontoStatisticalMethodsofAnalysis_practicequestions"
-    #   parts => ["M", "01", "IntroductiontoStatisticalMethodsofAnalysis", "practicequestions"]
-
-    # 4. Basic validation:
-    #    - The first part should be "M" (ignoring case).
-    #    - The second part should be numeric (the module number).
-    #    - The last part is "practicequestions".
-    #    - Everything in between is the actual topic name.
-    if len(parts) < 4:
-        return "Unknown Topic"
-
-    if parts[0].upper() == "M" and parts[-1].lower() == "practicequestions" and parts[1].isdigit():
-        # 5. Join all segments from index 2 up to the one before the last
-        #    to form the topic name.
-        topic_parts = parts[2:-1]  # everything between the module number and 'practicequestions'
-        topic = "_".join(topic_parts)  # join them with underscores if needed
-        topic = topic.replace('_', ' ')  # convert underscores to spaces
-        return topic.title().strip()
-
-    return "Unknown Topic"
+def apply_attempt_stats(db, attempts: list):
+    """Fold newly stored attempts into everything derived from them."""
+    apply_attempt_rollups(db, attempts)
+    apply_score_histograms(db, attempts)
+    apply_leaderboards(db, attempts)
+    apply_question_stats(db, attempts)
 
-
-def get_attempt_number(db, username: str, topic_name: str) -> int:
-    collection = db.test_attempts
-    count = collection.count_documents({"username": username, "topic_name": topic_name})
-    return count + 1
-
-def store_test_attempt(db, test_data: dict):
-    collection = db.test_attempts
-    result = collection.insert_one(test_data)
-    return result.inserted_id
+# One write-behind queue per server process, shared by every session
+@st.cache_resource
+def get_attempt_writer(_db):
+    ensure_attempt_counter_indexes(_db)
+    ensure_rollup_indexes(_db)
+    ensure_histogram_indexes(_db)
+    ensure_leaderboard_indexes(_db)
+    ensure_question_stats_indexes(_db)
+    ensure_attempt_indexes(_db)
+    return AttemptWriter(
+        _db.test_attempts,
+        max_queue=int(os.getenv("ATTEMPT_QUEUE_SIZE", DEFAULT_MAX_QUEUE)),
+        spool_path=os.getenv("ATTEMPT_SPOOL_PATH", DEFAULT_SPOOL_PATH),
+        on_written=lambda attempts: apply_attempt_stats(_db, attempts)
+    )
 def initialize_test_session():
     """Ensure all required session state variables are initialized."""
     session_defaults = {
         "test_started": False,
         "mcqs": [],
-        "current_index": 0,
-        "score": 0,
-        "selected_answers": {},
+        "test_session": None,
         "results": [],
-        "question_timers": {},
-        "question_status": {},
-        "last_update_time": datetime.now(),
-        "all_questions_processed": False,
         "focus_lost": False,
         "focus_confirmed": False,
-        "attempt_stored": False
+        "attempt_stored": False,
+        "client_timed_test": False,
+        "timing_violation": False
     }
     
     for key, default in session_defaults.items():
         if key not in st.session_state:
             st.session_state[key] = default
 
-# Initialize session before accessing any session state variables
-initialize_test_session()
-
-st.markdown("""
+# Module code only runs for the first session that imports this page, so main() renders these
+TEST_STYLES = """
 <style>
     .hidden-button {
         display: none;
@@ -194,120 +167,130 @@ st.markdown("""
         border: 1px solid #D1D5DB;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 def extract_mcqs_from_pdf(pdf_file):
     pdf_file.seek(0)
-    extracted_text = ""
     try:
-        doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        for page in doc:
-            extracted_text += page.get_text("text") + "\n\n"
+        return extract_mcqs_cached(pdf_file.read())
     except Exception as e:
         st.error(f"Error extracting text: {e}")
         return []
-    mcq_pattern = re.compile(
-        r'(\d+)\.\s*(.+?)\n'
-        r'A\)\s*(.+?)\n'
-        r'B\)\s*(.+?)\n'
-        r'C\)\s*(.+?)\n'
-        r'D\)\s*(.+?)\n'
-        r'Answer:\s*([ABCD])',
-        re.DOTALL | re.MULTILINE
-    )
-    mcqs = []
-    for match in mcq_pattern.finditer(extracted_text):
-        question = match.group(2).strip()
-        options = {
-            "A": match.group(3).strip(),
-            "B": match.group(4).strip(),
-            "C": match.group(5).strip(),
-            "D": match.group(6).strip(),
-        }
-        correct_answer = match.group(7).strip()
-        mcqs.append({"question": question, "options": options, "answer": correct_answer})
-    return mcqs
 if "test_started" not in st.session_state:
     st.session_state["test_started"] = False
 if "mcqs" not in st.session_state:
     st.session_state["mcqs"] = []
-if "current_index" not in st.session_state:
-    st.session_state["current_index"] = 0
-if "score" not in st.session_state:
-    st.session_state["score"] = 0
-if "selected_answers" not in st.session_state:
-    st.session_state["selected_answers"] = {}
+if "test_session" not in st.session_state:
+    st.session_state["test_session"] = None
 if "results" not in st.session_state:
     st.session_state["results"] = []
-if "question_timers" not in st.session_state:
-    st.session_state["question_timers"] = {}
-if "question_status" not in st.session_state:
-    st.session_state["question_status"] = {}
-if "last_update_time" not in st.session_state:
-    st.session_state["last_update_time"] = datetime.now()
-if "all_questions_processed" not in st.session_state:
-    st.session_state["all_questions_processed"] = False
 def navigate_to_question(question_index):
-    if question_index < len(st.session_state["mcqs"]):
-        st.session_state["current_index"] = question_index
-        st.session_state["last_update_time"] = datetime.now()
-def update_timers():
-    now = datetime.now()
-    elapsed_seconds = (now - st.session_state["last_update_time"]).total_seconds()
-    st.session_state["last_update_time"] = now
-    current_idx = st.session_state["current_index"]
-    if current_idx in st.session_state["question_timers"] and st.session_state["question_timers"][current_idx] > 0:
-        st.session_state["question_timers"][current_idx] = max(0, st.session_state["question_timers"][current_idx] - elapsed_seconds)
-        if st.session_state["question_timers"][current_idx] <= 0:
-            handle_time_up(current_idx)
-def handle_time_up(question_index):
-    mcqs = st.session_state["mcqs"]
-    option_key = f"option_q{question_index}"
-    st.session_state["question_status"][question_index] = "expired"
-    if option_key in st.session_state and st.session_state[option_key]:
-        selected_option = st.session_state[option_key][0]
+    test_session = st.session_state["test_session"]
+    if question_index < len(test_session):
+        previous_index = test_session.current_index
+        test_session.activate(question_index, time.time())
+        refresh_nav_item(previous_index)
+        refresh_nav_item(question_index)
+def check_timer_expiry():
+    """Expire the current question if its deadline has passed. Returns True if it did."""
+    test_session = st.session_state["test_session"]
+    previous_index = test_session.current_index
+    if test_session.expire_if_due(time.time()):
+        refresh_nav_item(previous_index)
+        refresh_nav_item(test_session.current_index)
+        return True
+    return False
+def record_answer(question_index):
+    """on_change callback of the answer radio: keep the choice in the compact session state."""
+    selected_option = st.session_state.get(f"option_q{question_index}")
+    st.session_state["test_session"].set_answer(question_index, selected_option[0] if selected_option else None)
+def submit_question(question_index):
+    test_session = st.session_state["test_session"]
+    test_session.close_question(question_index, COMPLETED, time.time())
+    refresh_nav_item(question_index)
+    refresh_nav_item(test_session.current_index)
+def init_navigation(question_count):
+    """Build the cached navigation entries for a new test."""
+    st.session_state["nav_items"] = [""] * question_count
+    st.session_state["status_lines"] = [""] * question_count
+    for i in range(question_count):
+        refresh_nav_item(i)
+def refresh_nav_item(question_index):
+    """Rebuild the navigation panel entry and status line for one question only."""
+    nav_items = st.session_state.get("nav_items")
+    if not nav_items or not 0 <= question_index < len(nav_items):
+        return
+    test_session = st.session_state["test_session"]
+    status = test_session.status_name(question_index)
+    remaining_time = int(test_session.remaining[question_index])
+    label = question_index + 1
+    if question_index == test_session.current_index:
+        button_class = "nav-button nav-button-active"
+        title = "Current Question"
+        status_line = f"- Q{label}: 🔍 **Current**"
+    elif status == "completed":
+        button_class = "nav-button nav-button-completed"
+        title = "Answered"
+        status_line = f"- Q{label}: ✅ Answered"
+    elif status == "expired":
+        button_class = "nav-button nav-button-expired"
+        title = "Time's up"
+        status_line = f"- Q{label}: ⏱️ Time's up"
     else:
-        selected_option = "Not answered"
-    is_correct = selected_option == mcqs[question_index]["answer"]
-    if question_index >= len(st.session_state["results"]):
-        st.session_state["results"].append({
-            "question": mcqs[question_index]["question"],
-            "user_answer": selected_option,
-            "correct_answer": mcqs[question_index]["answer"],
-            "is_correct": is_correct
-        })
-    next_index = find_next_available_question(question_index)
-    if next_index is not None:
-        st.session_state["current_index"] = next_index
-        st.session_state["question_status"][next_index] = "active"
+        button_class = "nav-button nav-button-pending"
+        title = f"{remaining_time}s left"
+        status_line = f"- Q{label}: ⏳ Pending ({remaining_time}s)"
+    if status not in ["completed", "expired"]:
+        nav_items[question_index] = f"<div class='{button_class}' title='{title}' onclick='document.getElementById(\"nav-btn-{question_index}\").click()'>{label}</div>"
     else:
-        st.session_state["current_index"] = len(mcqs)
-        st.session_state["all_questions_processed"] = True
-def find_next_available_question(current_index):
-    mcqs = st.session_state["mcqs"]
-    for i in range(len(mcqs)):
-        status = st.session_state["question_status"].get(i, "pending")
-        if status not in ["completed", "expired"] and i != current_index:
-            return i
-    return None
+        nav_items[question_index] = f"<div class='{button_class}' title='{title}'>{label}</div>"
+    st.session_state["status_lines"][question_index] = status_line
+@st.fragment(run_every=1)
+def show_question_timer():
+    """
+    Countdown for the current question. Only this fragment reruns every second;
+    the rest of the page is rebuilt only when the question actually changes.
+    """
+    if check_timer_expiry():
+        st.rerun()
+    test_session = st.session_state["test_session"]
+    remaining_time = int(test_session.remaining_time(test_session.current_index, time.time()))
+    timer_color = "#1E3A8A" if remaining_time > 10 else "#DC2626"
+    st.markdown(f"""
+    <div class='timer-display' style='color: {timer_color};'>
+        ⏱️ {remaining_time} seconds
+    </div>
+    """, unsafe_allow_html=True)
 def reset_session():
     st.session_state["test_started"] = False
-    st.session_state["current_index"] = 0
-    st.session_state["score"] = 0
-    st.session_state["selected_answers"] = {}
+    st.session_state["test_session"] = None
     st.session_state["results"] = []
-    st.session_state["question_timers"] = {}
-    st.session_state["question_status"] = {}
-    st.session_state["all_questions_processed"] = False
+    st.session_state["nav_items"] = []
+    st.session_state["status_lines"] = []
     st.session_state["focus_lost"] = False
     st.session_state["focus_confirmed"] = False
     st.session_state["mcqs"] = []
     st.session_state["attempt_stored"] = False
+    st.session_state["client_timed_test"] = False
+    st.session_state["timing_violation"] = False
+
+def run_client_timed_test():
+    """Browser-timed mode: the component runs the test and posts every answer back at once."""
+    st.markdown("<h1 class='main-header'>📝 Online MCQ Test</h1>", unsafe_allow_html=True)
+    mcqs = st.session_state["mcqs"]
+    submission = timed_test(mcqs, SECONDS_PER_QUESTION, st.session_state["test_id"], key="timed_test_runner")
+    if not submission or submission.get("test_id") != st.session_state["test_id"]:
+        return
+
+    server_elapsed = (datetime.now() - st.session_state["total_test_start_time"]).total_seconds()
+    timing_violation = apply_client_submission(st.session_state["test_session"], submission, SECONDS_PER_QUESTION, server_elapsed)
+    st.session_state["timing_violation"] = timing_violation
+    st.session_state["focus_lost"] = bool(submission.get("focus_lost"))
+    st.rerun()
 
 def main():
-    if "focus_lost" not in st.session_state:
-        st.session_state["focus_lost"] = False
-    if "focus_confirmed" not in st.session_state:
-        st.session_state["focus_confirmed"] = False
+    # Every session needs its defaults, not just the one that first imported this module
+    initialize_test_session()
+    st.markdown(TEST_STYLES, unsafe_allow_html=True)
     
     # Get database connection at the start of the function
     db, fs = get_database_connection()
@@ -338,51 +321,62 @@ Answer: C""")
                     if selected_pdf_data:
                         topic_name = extract_topic_from_filename(st.session_state.selected_practice_pdf)
                         st.session_state["test_topic"] = topic_name
-                        attempt_number = get_attempt_number(db, st.session_state.get("user_session", "guest"), topic_name)
-                        st.session_state["attempt_number"] = attempt_number
+                        # Subject and subsection from SUBJECTS_DATA, for the cross-topic analytics
+                        pdf_metadata = selected_pdf_data.get("metadata") or {}
+                        st.session_state["test_subject"] = pdf_metadata.get("subject")
+                        st.session_state["test_subsection"] = pdf_metadata.get("topic")
                         with st.spinner("Fetching practice questions..."):
-                            pdf_data = fs.get(selected_pdf_data["_id"]).read()
-                            extracted_mcqs = extract_mcqs_from_pdf(io.BytesIO(pdf_data))
+                            parse_status = st.empty()
+
+                            def show_parse_progress(page_number, page_count, question_count):
+                                parse_status.caption(f"Parsing page {page_number} of {page_count} — {question_count} questions found")
+
+                            try:
+                                extracted_mcqs = get_practice_questions(db, fs, selected_pdf_data, progress=show_parse_progress)
+                            except Exception as e:
+                                st.error(f"Error extracting text: {e}")
+                                extracted_mcqs = []
+                            parse_status.empty()
                         
                         if extracted_mcqs:
                             st.success(f"✅ Successfully extracted {len(extracted_mcqs)} questions!")
-                            st.session_state["mcqs"] = extracted_mcqs
-                            random.shuffle(st.session_state["mcqs"])
+                            # The question set is shared by every session; this session only keeps its shuffled order
+                            st.session_state["mcqs"] = ShuffledQuestions(extracted_mcqs)
                             
+                            client_timed = st.toggle(
+                                "⚡ Run the timers in my browser (recommended for long mock exams)",
+                                key="client_timed_toggle"
+                            )
                             if st.button("🚀 Start Test", use_container_width=True):
                                 # ✅ Reset test-related session variables before starting
                                 st.session_state.update({
                                     "test_started": True,
-                                    "current_index": 0,
-                                    "score": 0,
-                                    "selected_answers": {},
+                                    "test_id": uuid.uuid4().hex,
+                                    "client_timed_test": client_timed,
+                                    "timing_violation": False,
+                                    # ✅ Timers, statuses and answers live in one compact object; the first question starts active
+                                    "test_session": TestSession(len(extracted_mcqs), SECONDS_PER_QUESTION, time.time()),
                                     "results": [],
-                                    "question_timers": {i: 60 for i in range(len(extracted_mcqs))},
-                                    "question_status": {i: "pending" for i in range(len(extracted_mcqs))},
-                                    "all_questions_processed": False,
                                     "focus_lost": False,
-                                    "total_test_start_time": datetime.now(),
-                                    "question_start_time": datetime.now()  # Reset the start time for the first question
+                                    "total_test_start_time": datetime.now()
                                 })
-                                st.session_state["question_status"][0] = "active"  # ✅ Ensure first question is active
+                                # In browser-timed mode the component owns the clocks and navigation
+                                if not client_timed:
+                                    init_navigation(len(extracted_mcqs))
                                 st.rerun()
 
                         else:
                             st.error("❌ No MCQs found in the selected practice PDF.")
 
+    elif st.session_state["client_timed_test"] and not st.session_state["test_session"].finished and not st.session_state["focus_lost"]:
+        run_client_timed_test()
     elif st.session_state["focus_lost"]:
         st.markdown("<h1 class='main-header'>⚠️ Test Terminated - Cheating Detected</h1>", unsafe_allow_html=True)
         st.error("Your test has been terminated because you switched tabs or applications during the test, which is against the rules.")
         mcqs = st.session_state["mcqs"]
-        for i in range(len(mcqs)):
-            if i >= len(st.session_state["results"]):
-                st.session_state["results"].append({
-                    "question": mcqs[i]["question"],
-                    "user_answer": "Not answered",
-                    "correct_answer": mcqs[i]["answer"],
-                    "is_correct": False,
-                    "time_taken": 0  # Add time taken field
-                })
+        # Questions that were not submitted or expired before the test ended count as not answered
+        if not st.session_state["results"]:
+            st.session_state["results"] = st.session_state["test_session"].build_results(mcqs)
         score = sum(1 for result in st.session_state["results"] if result["is_correct"])
         total = len(mcqs)
         percentage = (score / total) * 100 if total > 0 else 0
@@ -398,8 +392,9 @@ Answer: C""")
             st.rerun()
     else:
         mcqs = st.session_state["mcqs"]
-        current_index = st.session_state["current_index"]
-        update_timers()
+        test_session = st.session_state["test_session"]
+        check_timer_expiry()
+        current_index = test_session.current_index
         if current_index < len(mcqs):
             st.markdown("<h1 class='main-header'>📝 Online MCQ Test</h1>", unsafe_allow_html=True)
             st.markdown("""
@@ -416,35 +411,15 @@ Answer: C""")
                 st.session_state["focus_lost"] = True
                 st.rerun()
             st.markdown("<h3>Question Navigation:</h3>", unsafe_allow_html=True)
-            nav_html = "<div class='navigation-panel'>"
-            for i in range(len(mcqs)):
-                status = st.session_state["question_status"].get(i, "pending")
-                remaining_time = int(st.session_state["question_timers"].get(i, 0))
-                if i == current_index:
-                    button_class = "nav-button nav-button-active"
-                    title = f"Current Question - {remaining_time}s left"
-                elif status == "completed":
-                    button_class = "nav-button nav-button-completed"
-                    title = "Answered"
-                elif status == "expired":
-                    button_class = "nav-button nav-button-expired"
-                    title = "Time's up"
-                else:
-                    button_class = "nav-button nav-button-pending"
-                    title = f"{remaining_time}s left"
-                if status not in ["completed", "expired"]:
-                    nav_html += f"<div class='{button_class}' title='{title}' onclick='document.getElementById(\"nav-btn-{i}\").click()'>{i+1}</div>"
-                else:
-                    nav_html += f"<div class='{button_class}' title='{title}'>{i+1}</div>"
-            nav_html += "</div>"
-            st.markdown(nav_html, unsafe_allow_html=True)
+            # Entries are cached per question and only rebuilt when that question changes
+            st.markdown("<div class='navigation-panel'>" + "".join(st.session_state["nav_items"]) + "</div>", unsafe_allow_html=True)
             nav_col = st.columns(min(10, len(mcqs)))
-            for i in range(len(mcqs)):
-                status = st.session_state["question_status"].get(i, "pending")
-                if status not in ["completed", "expired"] and i != current_index:
+            for i in test_session.pending:
+                if i != current_index:
                     with nav_col[i % len(nav_col)]:
                         if st.button(f"{i+1}", key=f"nav-btn-{i}", help=f"Navigate to question {i+1}"):
                             navigate_to_question(i)
+                            st.rerun()
             progress_text = f"Question {current_index + 1} of {len(mcqs)}"
             progress_value = (current_index + 1) / len(mcqs)
             st.progress(progress_value)
@@ -455,97 +430,43 @@ Answer: C""")
                 st.markdown(f"""
                 <div class='question-container'>
                     <h3>Question {current_index + 1}:</h3>
-                    <p style='font-size: 1.2rem;'>{question_data['question']}</p>
+                    <p style='font-size: 1.2rem;'>{question_data.question}</p>
                 </div>
                 """, unsafe_allow_html=True)
                 option_key = f"option_q{current_index}"
-                options = list(question_data["options"].items())
+                options = list(question_data.options)
                 default_index = None
-                if option_key in st.session_state:
-                    selected_option = st.session_state[option_key]
-                    if selected_option:
-                        for idx, (opt_key, _) in enumerate(options):
-                            if opt_key == selected_option[0]:
-                                default_index = idx
-                                break
-                selected_option = st.radio(
+                saved_answer = test_session.answer_letter(current_index)
+                if saved_answer:
+                    for idx, (opt_key, _) in enumerate(options):
+                        if opt_key == saved_answer:
+                            default_index = idx
+                            break
+                st.radio(
                     "Select your answer:",
                     options,
                     format_func=lambda x: f"{x[0]}) {x[1]}",
                     key=option_key,
                     index=default_index,
-                    label_visibility="collapsed"
+                    label_visibility="collapsed",
+                    on_change=record_answer,
+                    args=(current_index,)
                 )
                 submit_button = st.button("Submit & Next ▶️", use_container_width=True)
                 if submit_button:
-                    # Track time taken for the current question
-                    time_taken = (datetime.now() - st.session_state.get("question_start_time", datetime.now())).total_seconds()
-                    st.session_state["question_start_time"] = datetime.now()  # Reset for next question
-    
-                    user_answer = selected_option[0] if selected_option else None
-                    is_correct = user_answer == question_data["answer"] if user_answer else False
-                    
-                    # Modify the results to include time taken
-                    question_result = {
-                        "question": question_data["question"],
-                        "user_answer": user_answer if user_answer else "Not answered",
-                        "correct_answer": question_data["answer"],
-                        "is_correct": is_correct,
-                        "time_taken": time_taken  # Add time taken for this question
-                    }
-                    
-                    if current_index >= len(st.session_state["results"]):
-                        st.session_state["results"].append(question_result)
-                    else:
-                        st.session_state["results"][current_index] = question_result
-                    
-                    if is_correct:
-                        st.session_state["score"] += 1
-                    st.session_state["question_status"][current_index] = "completed"
-                    next_index = find_next_available_question(current_index)
-                    if next_index is not None:
-                        st.session_state["current_index"] = next_index
-                        st.session_state["question_status"][next_index] = "active"
-                    else:
-                        st.session_state["current_index"] = len(mcqs)
-                        st.session_state["all_questions_processed"] = True
+                    submit_question(current_index)
                     st.rerun()
             with col2:
-                remaining_time = int(st.session_state["question_timers"].get(current_index, 0))
-                timer_color = "#1E3A8A" if remaining_time > 10 else "#DC2626"
-                st.markdown(f"""
-                <div class='timer-display' style='color: {timer_color};'>
-                    ⏱️ {remaining_time} seconds
-                </div>
-                """, unsafe_allow_html=True)
-                completed_count = sum(1 for status in st.session_state["question_status"].values() if status in ["completed", "expired"])
+                show_question_timer()
+                completed_count = test_session.completed_count + test_session.expired_count
                 st.markdown(f"**Progress:** {completed_count}/{len(mcqs)} questions")
                 st.markdown("**Question Status:**")
-                for i in range(len(mcqs)):
-                    status = st.session_state["question_status"].get(i, "pending")
-                    time_left = int(st.session_state["question_timers"].get(i, 0))
-                    if status == "completed":
-                        st.markdown(f"- Q{i+1}: ✅ Answered")
-                    elif status == "expired":
-                        st.markdown(f"- Q{i+1}: ⏱️ Time's up")
-                    elif i == current_index:
-                        st.markdown(f"- Q{i+1}: 🔍 **Current** ({time_left}s)")
-                    else:
-                        st.markdown(f"- Q{i+1}: ⏳ Pending ({time_left}s)")
-            time.sleep(0.5)
-            st.rerun()
+                st.markdown("\n".join(st.session_state["status_lines"]))
         else:
             if current_index >= len(mcqs):  # Test complete branch
-                # Ensure that any unanswered questions are marked as "Not answered"
-                for i in range(len(mcqs)):
-                    if i >= len(st.session_state["results"]):
-                        st.session_state["results"].append({
-                            "question": mcqs[i]["question"],
-                            "user_answer": "Not answered",
-                            "correct_answer": mcqs[i]["answer"],
-                            "is_correct": False,
-                            "time_taken": 0  # Add time taken field
-                        })
+                # Results with question text are only built now that the test is over
+                if not st.session_state["results"]:
+                    st.session_state["results"] = test_session.build_results(mcqs)
                 
                 # Calculate overall score and percentage
                 score = sum(1 for result in st.session_state["results"] if result["is_correct"])
@@ -557,23 +478,36 @@ Answer: C""")
 
                 # Only store the attempt if it hasn't been stored yet
                 if not st.session_state.get("attempt_stored", False):
+                    username = st.session_state.get("user_session", "guest")
+                    topic_name = st.session_state.get("test_topic", "Unknown Topic")
+                    attempt_writer = get_attempt_writer(db)
                     test_attempt = {
-                        "username": st.session_state.get("user_session", "guest"),
-                        "topic_name": st.session_state.get("test_topic", "Unknown Topic"),
-                        "attempt_number": st.session_state.get("attempt_number", 1),
-                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "username": username,
+                        "topic_name": topic_name,
+                        "subject": st.session_state.get("test_subject"),
+                        "subsection": st.session_state.get("test_subsection"),
+                        # Claimed atomically now, so two tabs finishing the same topic never share a number
+                        "attempt_number": claim_attempt_number(db, username, topic_name),
+                        "timestamp": datetime.now(),
                         "total_score": score,
                         "total_questions": total,
                         "total_time_taken": total_test_time,
-                        "average_time_per_question": total_test_time / total if total > 0 else 0,
-                        "results": st.session_state["results"]
+                        "average_time_per_question": total_test_time / total if total > 0 else 0
                     }
-                    attempt_id = store_test_attempt(db, test_attempt)
-                    st.success(f"Test attempt saved with id: {attempt_id}")
+                    # Only ids, answer codes, correctness and times are stored; the question text is shared
+                    test_attempt.update(compact_results([question_id(q) for q in mcqs], st.session_state["results"]))
+                    if st.session_state["client_timed_test"]:
+                        test_attempt["client_timed"] = True
+                        test_attempt["timing_violation"] = st.session_state["timing_violation"]
+                    # Queued for a background batch write so this page renders straight away
+                    attempt_id = attempt_writer.submit(test_attempt)
+                    st.success(f"Test attempt queued for saving (provisional id: {attempt_id})")
                     st.session_state["attempt_stored"] = True  # Set the flag to avoid duplicate storage
 
                 # Display final results
                 st.markdown("<h1 class='main-header'>🎉 Test Completed!</h1>", unsafe_allow_html=True)
+                if st.session_state["timing_violation"]:
+                    st.warning("⚠️ The answer timings reported by your browser did not match the server clock, or the test ran past its time limit. This attempt has been flagged for review.")
                 st.markdown(f"""
                     <div class='score-display'>
                         <h2>Your Score: {score} out of {total} ({percentage:.1f}%)</h2>
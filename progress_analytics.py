@@ -0,0 +1,179 @@
+"""
+Cross-topic progress analytics over SUBJECTS_DATA.
+
+All of a user's attempts are loaded with one projected query into a
+columnar pandas frame (scores, question counts and time totals only), and
+every metric is a vectorized groupby over that frame, so the page stays
+fast for users with tens of thousands of attempts.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from study_resources import SUBJECTS_DATA
+from mcq_parser import extract_topic_from_filename
+from scoring import SCHEMES, count_matrix, score_counts, maximum_marks
+
+ATTEMPT_COLUMNS = ["topic_name", "subject", "subsection", "timestamp", "total_score", "total_questions",
+                   "question_time_total", "unanswered"]
+ROLLING_WINDOW = 10
+# Subsections below this accuracy are listed as weak topics
+WEAK_ACCURACY = 60.0
+
+
+def practice_topic_subjects(db) -> dict:
+    """topic_name -> (subject, subsection) for attempts stored before they recorded their subject."""
+    mapping = {}
+    for doc in db.fs.files.find({"filename": {"$regex": "practicequestions\\.pdf$"}},
+                                {"filename": 1, "metadata.subject": 1, "metadata.topic": 1}):
+        metadata = doc.get("metadata") or {}
+        topic_name = extract_topic_from_filename(doc["filename"])
+        if topic_name and metadata.get("subject"):
+            mapping[topic_name] = (metadata["subject"], metadata.get("topic"))
+    return mapping
+
+
+def load_attempt_frame(db, username: str) -> pd.DataFrame:
+    """One row per attempt with only the columns the analytics need."""
+    projection = {column: 1 for column in ATTEMPT_COLUMNS}
+    projection["_id"] = 0
+    cursor = db.test_attempts.find({"username": username}, projection, batch_size=10000).sort("timestamp", 1)
+    frame = pd.DataFrame(list(cursor), columns=ATTEMPT_COLUMNS)
+    if frame.empty:
+        return frame
+
+    missing = frame["subject"].isna()
+    if missing.any():
+        mapping = practice_topic_subjects(db)
+        topics = frame.loc[missing, "topic_name"]
+        frame.loc[missing, "subject"] = topics.map({topic: pair[0] for topic, pair in mapping.items()})
+        frame.loc[missing, "subsection"] = topics.map({topic: pair[1] for topic, pair in mapping.items()})
+    frame["subject"] = frame["subject"].fillna("Other")
+    frame["subsection"] = frame["subsection"].fillna(frame["topic_name"])
+
+    frame["unanswered"] = frame["unanswered"].fillna(0)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], errors="coerce")
+    questions = frame["total_questions"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frame["score_pct"] = np.where(questions > 0, frame["total_score"].to_numpy(dtype=float) / questions * 100, np.nan)
+        frame["time_per_question"] = np.where(
+            questions > 0, frame["question_time_total"].to_numpy(dtype=float) / questions, np.nan)
+    return frame
+
+
+def accuracy_by(frame: pd.DataFrame, keys: list) -> pd.DataFrame:
+    """Attempts, question-weighted accuracy and average score per group."""
+    grouped = frame.groupby(keys, sort=False).agg(
+        attempts=("score_pct", "size"),
+        correct=("total_score", "sum"),
+        questions=("total_questions", "sum"),
+        average_score=("score_pct", "mean"),
+    )
+    grouped["accuracy"] = grouped["correct"] / grouped["questions"].where(grouped["questions"] > 0) * 100
+    return grouped
+
+
+def subsection_table(frame: pd.DataFrame) -> pd.DataFrame:
+    """Accuracy for every SUBJECTS_DATA subsection, including ones never attempted."""
+    index = pd.MultiIndex.from_tuples(
+        [(subject, subsection.strip()) for subject, data in SUBJECTS_DATA.items() for subsection in data["subsections"]],
+        names=["subject", "subsection"]
+    )
+    stripped = frame.assign(subsection=frame["subsection"].str.strip())
+    table = accuracy_by(stripped, ["subject", "subsection"])
+    # Attempts outside SUBJECTS_DATA are kept after the known subsections
+    return table.reindex(index.append(table.index.difference(index)))
+
+
+def rolling_scores(frame: pd.DataFrame, window: int = ROLLING_WINDOW) -> pd.DataFrame:
+    """Per-subject rolling average score by attempt date, as columns for a line chart."""
+    dated = frame.dropna(subset=["timestamp"]).sort_values("timestamp")
+    rolling = (dated.groupby("subject")["score_pct"]
+               .rolling(window, min_periods=1).mean()
+               .reset_index(level=0))
+    rolling["timestamp"] = dated.loc[rolling.index, "timestamp"]
+    return rolling.pivot_table(index="timestamp", columns="subject", values="score_pct").ffill()
+
+
+def time_percentiles(frame: pd.DataFrame) -> pd.DataFrame:
+    """p50/p90/p99 seconds per question for each subject."""
+    percentiles = (frame.dropna(subset=["time_per_question"])
+                   .groupby("subject")["time_per_question"]
+                   .quantile([0.5, 0.9, 0.99])
+                   .unstack()
+                   .reindex(columns=[0.5, 0.9, 0.99]))  # no columns when no attempt recorded its times
+    percentiles.columns = ["p50", "p90", "p99"]
+    return percentiles
+
+
+def weak_topic_matrix(frame: pd.DataFrame) -> pd.DataFrame:
+    """Accuracy per subsection (rows) and month (columns) for the heatmap."""
+    dated = frame.dropna(subset=["timestamp"])
+    months = dated["timestamp"].dt.to_period("M").astype(str)
+    grouped = dated.groupby([dated["subject"] + " · " + dated["subsection"].str.strip(), months]).agg(
+        correct=("total_score", "sum"), questions=("total_questions", "sum"))
+    accuracy = grouped["correct"] / grouped["questions"].where(grouped["questions"] > 0) * 100
+    return accuracy.unstack().sort_index(axis=1)
+
+
+def what_if_scores(frame: pd.DataFrame, schemes: list) -> pd.DataFrame:
+    """Percentage of the available marks per subject under each scheme, for the whole history at once."""
+    correct = frame["total_score"].to_numpy(dtype=float)
+    unanswered = frame["unanswered"].to_numpy(dtype=float)
+    counts = count_matrix(correct, frame["total_questions"].to_numpy(dtype=float) - correct - unanswered, unanswered)
+    marks = pd.DataFrame(score_counts(counts, schemes, frame["subject"]), columns=[s.name for s in schemes])
+    maximum = pd.DataFrame(maximum_marks(frame["total_questions"].to_numpy(dtype=float), schemes, frame["subject"]),
+                           columns=marks.columns)
+    by_subject = frame["subject"].to_numpy()
+    totals = marks.groupby(by_subject).sum()
+    return totals / maximum.groupby(by_subject).sum().where(lambda m: m > 0) * 100
+
+
+def heat_color(value) -> str:
+    """Red for low accuracy through yellow to green for high; blank cells stay uncoloured."""
+    if pd.isna(value):
+        return ""
+    red = int(220 - 180 * value / 100)
+    green = int(60 + 160 * value / 100)
+    return f"background-color: rgb({red}, {green}, 80); color: white"
+
+
+def show_cross_topic_analytics(db, username: str):
+    frame = load_attempt_frame(db, username)
+    if frame.empty:
+        st.info("No test attempts found. Start taking tests to see your progress!")
+        return
+
+    st.subheader("Accuracy by Subject")
+    subjects = accuracy_by(frame, ["subject"]).sort_values("accuracy")
+    col1, col2 = st.columns([2, 1])
+    col1.bar_chart(subjects["accuracy"])
+    col2.dataframe(subjects[["attempts", "accuracy"]].round(1), use_container_width=True)
+
+    st.subheader("Rolling Average Score")
+    st.caption(f"Average of the last {ROLLING_WINDOW} attempts in each subject.")
+    st.line_chart(rolling_scores(frame))
+
+    percentiles = time_percentiles(frame)
+    if not percentiles.empty:
+        st.subheader("Time per Question")
+        st.dataframe(percentiles.round(1), use_container_width=True)
+
+    st.subheader("What-if Scoring")
+    st.caption("Share of the available marks in each subject if all your attempts were scored under each scheme.")
+    st.dataframe(what_if_scores(frame, list(SCHEMES.values())).round(1), use_container_width=True)
+
+    st.subheader("Weak Topics")
+    subsections = subsection_table(frame)
+    weak = subsections[subsections["accuracy"] < WEAK_ACCURACY].sort_values("accuracy")
+    if weak.empty:
+        st.success(f"No subsection is below {WEAK_ACCURACY:.0f}% accuracy.")
+    else:
+        st.dataframe(weak[["attempts", "accuracy"]].round(1), use_container_width=True)
+    not_attempted = subsections["attempts"].isna().sum()
+    if not_attempted:
+        st.caption(f"{not_attempted} subsections have not been attempted yet.")
+
+    matrix = weak_topic_matrix(frame)
+    if not matrix.empty:
+        st.markdown("**Accuracy by month (%)**")
+        st.dataframe(matrix.style.map(heat_color).format("{:.0f}", na_rep=""), use_container_width=True)
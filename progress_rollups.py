@@ -0,0 +1,222 @@
+"""
+Per-user, per-topic progress rollups.
+
+``progress_rollups`` holds one small document per (username, topic_name)
+with running totals and the most recent scores, so the progress page reads
+one document instead of every attempt:
+
+    attempt_count, score_percent_sum, best_score_percent,
+    correct_sum, question_count_sum, unanswered_sum,
+    question_time_sum, timed_question_count, total_time_sum,
+    recent: [{attempt_number, timestamp, score_percent, correct, incorrect, unanswered}]  (last RECENT_ATTEMPTS)
+
+``incorrect`` counts every question not answered correctly, including the
+``unanswered`` ones.
+
+Rollups are updated with $inc/$max/$push as attempts are stored. Rollups
+for existing data, or after a failed update, are rebuilt server side with
+an aggregation pipeline:
+
+    python progress_rollups.py --rebuild [--username NAME]
+"""
+import argparse
+from pymongo import MongoClient, ASCENDING, UpdateOne, ReplaceOne
+from attempt_store import attempt_question_times, attempt_correct_count, attempt_question_count, attempt_unanswered_count
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+# Attempts kept in ``recent`` for the trend and accuracy charts
+RECENT_ATTEMPTS = 50
+
+
+def ensure_rollup_indexes(db):
+    db.progress_rollups.create_index([("username", ASCENDING), ("topic_name", ASCENDING)], unique=True)
+
+
+def score_percent(attempt: dict) -> float:
+    total = attempt.get("total_questions") or 1
+    return attempt.get("total_score", 0) / total * 100
+
+
+def rollup_update(attempt: dict) -> UpdateOne:
+    """The upsert that folds one stored attempt into its user/topic rollup."""
+    question_times = attempt_question_times(attempt)
+    correct = attempt_correct_count(attempt)
+    percent = score_percent(attempt)
+    unanswered = attempt_unanswered_count(attempt)
+    return UpdateOne(
+        {"username": attempt.get("username"), "topic_name": attempt.get("topic_name")},
+        {
+            "$inc": {
+                "attempt_count": 1,
+                "score_percent_sum": percent,
+                "correct_sum": correct,
+                "question_count_sum": attempt_question_count(attempt),
+                "unanswered_sum": unanswered,
+                "question_time_sum": sum(question_times),
+                "timed_question_count": len(question_times),
+                "total_time_sum": attempt.get("total_time_taken", 0),
+            },
+            "$max": {"best_score_percent": percent},
+            "$push": {"recent": {
+                "$each": [{
+                    "attempt_number": attempt.get("attempt_number", 1),
+                    "timestamp": attempt.get("timestamp"),
+                    "score_percent": percent,
+                    "correct": correct,
+                    "incorrect": attempt_question_count(attempt) - correct,
+                    "unanswered": unanswered,
+                }],
+                "$slice": -RECENT_ATTEMPTS,
+            }},
+        },
+        upsert=True
+    )
+
+
+def apply_attempt_rollups(db, attempts: list):
+    """Fold newly stored attempts into their rollups in one bulk write."""
+    if attempts:
+        db.progress_rollups.bulk_write([rollup_update(attempt) for attempt in attempts], ordered=True)
+
+
+def load_rollup(db, username: str, topic_name: str):
+    return db.progress_rollups.find_one({"username": username, "topic_name": topic_name}, {"_id": 0})
+
+
+def rollup_topics(db, username: str) -> list:
+    return db.progress_rollups.distinct("topic_name", {"username": username})
+
+
+def rolled_up_attempt_count(db, username: str) -> int:
+    """How many of a user's attempts their rollups account for."""
+    totals = list(db.progress_rollups.aggregate([
+        {"$match": {"username": username}},
+        {"$group": {"_id": None, "attempts": {"$sum": "$attempt_count"}}},
+    ]))
+    return totals[0]["attempts"] if totals else 0
+
+
+def rollup_pipeline(match: dict) -> list:
+    """
+    Aggregation that computes rollup documents for the attempts matching
+    ``match`` inside MongoDB. Only scalar fields are projected, so neither
+    question ids nor embedded results leave the server; per-question times
+    of attempts in the old embedded format are summed from ``results``.
+    """
+    has_compact_times = {"$gt": ["$question_time_total", None]}
+    return [
+        {"$match": match},
+        {"$project": {
+            "username": 1,
+            "topic_name": 1,
+            "attempt_number": {"$ifNull": ["$attempt_number", 1]},
+            "timestamp": 1,
+            "total_time_taken": {"$ifNull": ["$total_time_taken", 0]},
+            "score_percent": {"$multiply": [
+                {"$divide": [{"$ifNull": ["$total_score", 0]},
+                             {"$cond": [{"$gt": ["$total_questions", 0]}, "$total_questions", 1]}]},
+                100
+            ]},
+            "correct": {"$ifNull": ["$total_score", 0]},
+            "question_count": {"$ifNull": ["$total_questions", 0]},
+            "question_time": {"$cond": [has_compact_times, "$question_time_total", {"$sum": "$results.time_taken"}]},
+            "unanswered": {"$ifNull": [
+                "$unanswered",
+                {"$size": {"$filter": {"input": {"$ifNull": ["$results", []]}, "as": "result",
+                                       "cond": {"$not": [{"$in": ["$$result.user_answer", ["A", "B", "C", "D"]]}]}}}}
+            ]},
+            "timed_questions": {"$cond": [
+                has_compact_times,
+                "$total_questions",
+                {"$size": {"$filter": {"input": {"$ifNull": ["$results", []]}, "as": "result",
+                                       "cond": {"$gt": ["$$result.time_taken", None]}}}}
+            ]},
+        }},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {"username": "$username", "topic_name": "$topic_name"},
+            "attempt_count": {"$sum": 1},
+            "score_percent_sum": {"$sum": "$score_percent"},
+            "best_score_percent": {"$max": "$score_percent"},
+            "correct_sum": {"$sum": "$correct"},
+            "question_count_sum": {"$sum": "$question_count"},
+            "unanswered_sum": {"$sum": "$unanswered"},
+            "question_time_sum": {"$sum": "$question_time"},
+            "timed_question_count": {"$sum": "$timed_questions"},
+            "total_time_sum": {"$sum": "$total_time_taken"},
+            "recent": {"$push": {
+                "attempt_number": "$attempt_number",
+                "timestamp": "$timestamp",
+                "score_percent": "$score_percent",
+                "correct": "$correct",
+                "incorrect": {"$subtract": ["$question_count", "$correct"]},
+                "unanswered": "$unanswered",
+            }},
+        }},
+        {"$project": {
+            "_id": 0,
+            "username": "$_id.username",
+            "topic_name": "$_id.topic_name",
+            "attempt_count": 1,
+            "score_percent_sum": 1,
+            "best_score_percent": 1,
+            "correct_sum": 1,
+            "question_count_sum": 1,
+            "unanswered_sum": 1,
+            "question_time_sum": 1,
+            "timed_question_count": 1,
+            "total_time_sum": 1,
+            "recent": {"$slice": ["$recent", -RECENT_ATTEMPTS]},
+        }},
+    ]
+
+
+def rebuild_rollups(db, username: str = None, topic_name: str = None) -> int:
+    """
+    Recompute rollups from test_attempts with one aggregation, for everyone
+    or just one user or user/topic. Only the finished rollup documents come
+    back to Python. They are written with upserts keyed on (username,
+    topic_name), so a rebuild never collides with the upserts of attempts
+    being stored; rollups with no attempts left are removed. Returns the
+    number of attempts they cover.
+    """
+    ensure_rollup_indexes(db)
+    match = {}
+    if username is not None:
+        match["username"] = username
+    if topic_name is not None:
+        match["topic_name"] = topic_name
+
+    rollups = list(db.test_attempts.aggregate(rollup_pipeline(match), allowDiskUse=True))
+    if rollups:
+        db.progress_rollups.bulk_write([
+            ReplaceOne({"username": rollup["username"], "topic_name": rollup["topic_name"]}, rollup, upsert=True)
+            for rollup in rollups
+        ], ordered=False)
+    rebuilt = {(rollup["username"], rollup["topic_name"]) for rollup in rollups}
+    stale = [doc["_id"] for doc in db.progress_rollups.find(match, {"username": 1, "topic_name": 1})
+             if (doc.get("username"), doc.get("topic_name")) not in rebuilt]
+    if stale:
+        db.progress_rollups.delete_many({"_id": {"$in": stale}})
+    return sum(rollup["attempt_count"] for rollup in rollups)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-user, per-topic progress rollups.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute rollups from test_attempts")
+    parser.add_argument("--username", help="Only rebuild this user's rollups")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    if args.rebuild:
+        print(f"Rebuilt rollups from {rebuild_rollups(db, args.username)} attempts.")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
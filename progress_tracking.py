@@ -1,7 +1,85 @@
+import math
+import numpy as np
 import streamlit as st
 import pandas as pd
-from datetime import datetime
 from study_resources import get_database_connection
+from attempt_store import load_attempt_results, parse_legacy_timestamp
+from progress_rollups import load_rollup, rollup_topics, rolled_up_attempt_count, score_percent
+from progress_analytics import show_cross_topic_analytics
+from score_histograms import load_histogram, percentile_rank, histogram_bands
+from leaderboards import load_leaderboard, leaderboard_names, SCOPES
+from scoring import SCHEMES, DEFAULT_SCHEME, count_matrix, score_counts, maximum_marks, score_recent
+
+ATTEMPTS_PER_PAGE = 10
+# Longer histories open in the compact table view
+COMPACT_HISTORY_THRESHOLD = 50
+
+def attempt_datetime(attempt: dict):
+    """The attempt's timestamp as a datetime; strings are only left by attempts not yet migrated."""
+    timestamp = attempt.get("timestamp")
+    if isinstance(timestamp, str):
+        return parse_legacy_timestamp(timestamp)
+    return timestamp
+
+def show_attempt_details(db, attempt_id):
+    """Fetch one attempt's per-question data and render it as a single markdown block."""
+    results = load_attempt_results(db, db.test_attempts.find_one({"_id": attempt_id}))
+    lines = []
+    for i, result in enumerate(results):
+        status_icon = "✅" if result.get("is_correct") else "❌"
+        lines.append(f"**Q{i+1}:** {result.get('question', '')}")
+        lines.append(f"- **Your Answer:** {result.get('user_answer', '')} {status_icon}")
+        lines.append(f"- **Correct Answer:** {result.get('correct_answer', '')}")
+        if "time_taken" in result:
+            lines.append(f"- **Time Taken:** {result['time_taken']:.2f} seconds")
+        lines.append("")
+    st.markdown("\n".join(lines))
+
+def ordinal(n: int) -> str:
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+def show_cohort_standing(db, topic_name: str, rollup: dict):
+    """Percentile of the user's latest and best scores among all attempts on the topic."""
+    # Topics attempted before histograms existed have none until score_histograms.py --rebuild
+    histogram = load_histogram(db, topic_name)
+    recent = rollup.get("recent", [])
+    if not recent or percentile_rank(histogram, recent[-1]["score_percent"]) is None:
+        return
+
+    st.subheader("Where You Stand")
+    latest = percentile_rank(histogram, recent[-1]["score_percent"])
+    best = percentile_rank(histogram, rollup["best_score_percent"])
+    st.markdown(f"Your latest score is in the **{ordinal(int(latest))} percentile** on {topic_name}.")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Latest Score Percentile", ordinal(int(latest)))
+    col2.metric("Best Score Percentile", ordinal(int(best)))
+    col3.metric("Attempts by All Students", histogram["count"])
+    bands = histogram_bands(histogram)
+    st.bar_chart(pd.DataFrame({"Attempts": list(bands.values())}, index=list(bands)))
+
+def show_leaderboards(db, username: str):
+    """Top scores of one topic or subject, read from its materialized board."""
+    scope = st.radio("Leaderboard for", SCOPES, horizontal=True, format_func=str.title)
+    # Attempts stored before leaderboards existed are ranked once leaderboards.py --rebuild runs
+    names = leaderboard_names(db, scope)
+    if not names:
+        st.info("No leaderboards yet.")
+        return
+
+    name = st.selectbox(f"Choose a {scope}", names)
+    board = load_leaderboard(db, scope, name)
+    entries = board.get("entries", []) if board else []
+    df_board = pd.DataFrame([{
+        "Rank": rank,
+        "Student": entry["username"],
+        "Best Score (%)": round(entry["score_percent"], 2),
+        "Avg Time per Question (s)": round(entry["time_per_question"], 2),
+    } for rank, entry in enumerate(entries, start=1)])
+    st.dataframe(df_board, hide_index=True, use_container_width=True)
+    ranks = [rank for rank, entry in enumerate(entries, start=1) if entry["username"] == username]
+    if ranks:
+        st.success(f"You are ranked #{ranks[0]} on {name}.")
 
 def show_progress_tracking():
     # Add a back button to return to home or the previous page
@@ -18,102 +96,130 @@ def show_progress_tracking():
     # Get current user's username
     username = st.session_state.get("user_session", "guest")
     
-    # Fetch all distinct topics for which the user has attempted tests
-    topics = collection.distinct("topic_name", {"username": username})
-    
+    # Topics and summaries come from the per-topic rollups, not from the attempts
+    topics = rollup_topics(db, username)
+    attempt_count = collection.count_documents({"username": username})
+    if attempt_count > rolled_up_attempt_count(db, username):
+        # Attempts stored before rollups existed; rebuilt offline with progress_rollups.py --rebuild
+        st.info("Some of your earlier test attempts have not been summarised yet. They will appear here once progress summaries are rebuilt.")
+
     if not topics:
-        st.info("No test attempts found. Start taking tests to see your progress!")
+        if not attempt_count:
+            st.info("No test attempts found. Start taking tests to see your progress!")
+        return
+
+    view = st.radio("View", ["Topic progress", "All subjects", "Leaderboards"], horizontal=True,
+                    label_visibility="collapsed")
+    if view == "All subjects":
+        show_cross_topic_analytics(db, username)
+        return
+    if view == "Leaderboards":
+        show_leaderboards(db, username)
         return
 
     # Let user select a topic from the dropdown
     selected_topic = st.selectbox("Topics for which you have attempted the test", topics)
+    # Switching schemes only re-weights the counts already in the rollup
+    scheme = SCHEMES[st.selectbox("Scoring scheme", list(SCHEMES), index=list(SCHEMES).index(DEFAULT_SCHEME))]
+    rollup = load_rollup(db, username, selected_topic)
     
-    # Fetch all test attempts for the selected topic, sorted by timestamp (most recent first)
-    attempts = list(collection.find({
-        "username": username,
-        "topic_name": selected_topic
-    }).sort("timestamp", -1))
-    
-    if not attempts:
+    if not rollup or not rollup.get("attempt_count"):
         st.info("No test attempts found for this topic. Start taking tests to see your progress!")
         return
 
     # ---------------- Progress Summary Dashboard ----------------
-    total_attempts = len(attempts)
-    avg_score = 0
-    total_time = 0
-    total_questions = 0
-
-    # Data for score over time chart
-    chart_data = []
-    
-    for attempt in attempts:
-        # Calculate percentage score for this attempt
-        total_q = attempt.get('total_questions', 1)
-        score = attempt.get('total_score', 0)
-        score_percent = (score / total_q) * 100
-        avg_score += score_percent
-        
-        # Attempt timestamp (assuming stored as a string; adjust parsing as needed)
-        timestamp = attempt.get("timestamp", "")
-        try:
-            dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            try:
-                dt = datetime.strptime(timestamp, "%Y-%m-%d")
-            except Exception:
-                dt = datetime.now()
-                
-        chart_data.append({"Date": dt, "Score (%)": score_percent})
-        
-        # Sum up time taken for each question in this attempt
-        results = attempt.get("results", [])
-        for result in results:
-            if "time_taken" in result:
-                total_time += result["time_taken"]
-                total_questions += 1
-
-    avg_score = avg_score / total_attempts if total_attempts > 0 else 0
-    avg_time = total_time / total_questions if total_questions > 0 else 0
+    total_attempts = rollup["attempt_count"]
+    avg_score = rollup["score_percent_sum"] / total_attempts
+    timed_questions = rollup.get("timed_question_count", 0)
+    avg_time = rollup.get("question_time_sum", 0) / timed_questions if timed_questions > 0 else 0
 
     st.subheader("Progress Summary Dashboard")
     col1, col2, col3 = st.columns(3)
     col1.metric("Total Attempts", total_attempts)
-    col2.metric("Average Score (%)", f"{avg_score:.2f}%")
+    if scheme.name == DEFAULT_SCHEME:
+        col2.metric("Average Score (%)", f"{avg_score:.2f}%")
+    else:
+        correct_sum = rollup.get("correct_sum", 0)
+        unanswered_sum = rollup.get("unanswered_sum", 0)
+        counts = count_matrix([correct_sum], [rollup.get("question_count_sum", 0) - correct_sum - unanswered_sum],
+                              [unanswered_sum])
+        avg_marks = score_counts(counts, [scheme])[0, 0] / total_attempts
+        avg_maximum = maximum_marks([rollup.get("question_count_sum", 0)], [scheme])[0, 0] / total_attempts
+        col2.metric("Average Marks", f"{avg_marks:.2f} / {avg_maximum:.0f}")
     col3.metric("Average Time per Question (s)", f"{avg_time:.2f}")
 
+    show_cohort_standing(db, selected_topic, rollup)
+
     # ---------------- Visual Analytics: Score Trend ----------------
+    recent = rollup.get("recent", [])
+    marks, maximum = score_recent(recent, scheme)
+    percents = [entry["score_percent"] for entry in recent] if scheme.name == DEFAULT_SCHEME \
+        else (marks / np.where(maximum > 0, maximum, 1) * 100).tolist()
+    chart_data = []
+    for entry, percent in zip(recent, percents):
+        dt = attempt_datetime(entry)
+        # An attempt without a usable date is left off the chart rather than drawn at "now"
+        if dt is not None:
+            chart_data.append({"Date": dt, "Score (%)": percent})
+
     st.subheader("Score Trend Over Time")
-    df_chart = pd.DataFrame(chart_data)
+    if total_attempts > len(recent):
+        st.caption(f"Showing your last {len(recent)} attempts.")
+    df_chart = pd.DataFrame(chart_data, columns=["Date", "Score (%)"])
     df_chart = df_chart.sort_values("Date")
     # Using Streamlit's built-in line chart for quick visualization
     st.line_chart(df_chart.rename(columns={"Date": "index"}).set_index("index"))
 
     # ---------------- Detailed Statistical Insights ----------------
     st.subheader("Test Attempts Accuracy Overview")
-    stats_data = []
-    for idx, attempt in enumerate(attempts):
-        results = attempt.get("results", [])
-        correct = sum(1 for r in results if r.get("is_correct"))
-        incorrect = len(results) - correct
-        stats_data.append({"Attempt": idx + 1, "Correct": correct, "Incorrect": incorrect})
+    stats_data = [{"Attempt": entry.get("attempt_number", idx + 1), "Correct": entry["correct"], "Incorrect": entry["incorrect"]}
+                  for idx, entry in enumerate(recent)]
     df_stats = pd.DataFrame(stats_data)
     # Using bar chart to compare correct vs incorrect counts for each attempt
     st.bar_chart(df_stats.set_index("Attempt"))
 
     # ---------------- Detailed Results for Each Attempt ----------------
     st.subheader("Detailed Test Attempt Results")
-    for attempt in attempts:
-        st.markdown(f"### Topic: {attempt.get('topic_name', 'N/A')} (Attempt #{attempt.get('attempt_number', 1)})")
-        st.markdown(f"**Date:** {attempt.get('timestamp', 'N/A')}")
-        st.markdown(f"**Score:** {attempt.get('total_score', 0)} out of {attempt.get('total_questions', 0)}")
-        with st.expander("View Detailed Results"):
-            results = attempt.get("results", [])
-            for i, result in enumerate(results):
-                status_icon = "✅" if result.get("is_correct") else "❌"
-                st.markdown(f"**Q{i+1}:** {result.get('question', '')}")
-                st.markdown(f"- **Your Answer:** {result.get('user_answer', '')} {status_icon}")
-                st.markdown(f"- **Correct Answer:** {result.get('correct_answer', '')}")
-                if "time_taken" in result:
-                    st.markdown(f"- **Time Taken:** {result['time_taken']} seconds")
-        st.markdown("---")
+    page_count = max(1, math.ceil(total_attempts / ATTEMPTS_PER_PAGE))
+    page_key = f"history_page_{selected_topic}"
+    page = min(st.session_state.get(page_key, 0), page_count - 1)
+
+    # One page of attempt headers from the (username, topic_name, timestamp) index; no per-question data
+    attempts = list(collection.find({
+        "username": username,
+        "topic_name": selected_topic
+    }, {"topic_name": 1, "attempt_number": 1, "timestamp": 1, "total_score": 1, "total_questions": 1})
+        .sort("timestamp", -1).skip(page * ATTEMPTS_PER_PAGE).limit(ATTEMPTS_PER_PAGE))
+
+    table_view = st.toggle("Compact table view", value=total_attempts > COMPACT_HISTORY_THRESHOLD, key="history_table_view")
+    if table_view:
+        st.dataframe(pd.DataFrame([{
+            "Attempt": attempt.get("attempt_number", 1),
+            "Date": attempt_datetime(attempt),
+            "Score": f"{attempt.get('total_score', 0)}/{attempt.get('total_questions', 0)}",
+            "Score (%)": round(score_percent(attempt), 1),
+        } for attempt in attempts]), hide_index=True, use_container_width=True)
+        labels = {attempt["_id"]: f"Attempt #{attempt.get('attempt_number', 1)}" for attempt in attempts}
+        selected_id = st.selectbox("View detailed results for", list(labels), index=None,
+                                   format_func=labels.get, key=f"history_details_{selected_topic}_{page}")
+        if selected_id is not None:
+            show_attempt_details(db, selected_id)
+    else:
+        for attempt in attempts:
+            st.markdown(f"### Topic: {attempt.get('topic_name', 'N/A')} (Attempt #{attempt.get('attempt_number', 1)})")
+            attempt_date = attempt_datetime(attempt)
+            st.markdown(f"**Date:** {attempt_date.strftime('%Y-%m-%d %H:%M:%S') if attempt_date else 'N/A'}")
+            st.markdown(f"**Score:** {attempt.get('total_score', 0)} out of {attempt.get('total_questions', 0)}")
+            if st.toggle("View Detailed Results", key=f"details_{attempt['_id']}"):
+                show_attempt_details(db, attempt["_id"])
+            st.markdown("---")
+
+    if page_count > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        if col1.button("◀ Newer", disabled=page == 0, use_container_width=True):
+            st.session_state[page_key] = page - 1
+            st.rerun()
+        col2.markdown(f"<p style='text-align: center;'>Page {page + 1} of {page_count}</p>", unsafe_allow_html=True)
+        if col3.button("Older ▶", disabled=page >= page_count - 1, use_container_width=True):
+            st.session_state[page_key] = page + 1
+            st.rerun()
@@ -0,0 +1,132 @@
+from datetime import datetime
+from pymongo import ASCENDING
+from mcq_parser import PARSER_VERSION, Question, extract_mcqs_from_bytes
+from mcq_cache import mcq_cache, compute_content_hash, find_question_set
+from attempt_store import store_questions, question_id
+
+# One document per practice PDF in GridFS:
+# {file_id, content_hash, parser_version, answer_key_version, filename, questions: [...], question_count,
+#  parse_errors: [{question_number, page, message}], created_at}
+# answer_key_version counts the regrades that corrected the file's answers; it is also kept in
+# the fs.files metadata and is part of the cache key, so every process picks up a corrected key.
+
+
+def ensure_question_bank_indexes(db):
+    collection = db.question_bank
+    collection.create_index([("file_id", ASCENDING), ("content_hash", ASCENDING)], unique=True)
+
+
+def answer_key_version(file_doc: dict) -> int:
+    return (file_doc.get("metadata") or {}).get("answer_key_version", 0)
+
+
+def question_set_key(content_hash: str, key_version: int = 0) -> str:
+    """Cache key of one file version under one answer key."""
+    return f"{content_hash}:{key_version}" if key_version else content_hash
+
+
+def corrected_answers(db, questions: tuple) -> tuple:
+    """Questions parsed from a PDF with their answers replaced by the regraded ones in ``questions``."""
+    stored = {q["_id"]: q.get("answer") for q in db.questions.find({"_id": {"$in": [question_id(q) for q in questions]}},
+                                                                  {"answer": 1})}
+    return tuple(q._replace(answer=stored.get(question_id(q)) or q.answer) for q in questions)
+
+
+def store_question_bank_entry(db, file_id, content_hash: str, questions: tuple, errors: list = (), filename: str = None,
+                              key_version: int = 0):
+    """Write already-parsed questions for one file version, replacing any older entry."""
+    ensure_question_bank_indexes(db)
+    db.question_bank.replace_one(
+        {"file_id": file_id},
+        {
+            "file_id": file_id,
+            "content_hash": content_hash,
+            "parser_version": PARSER_VERSION,
+            "answer_key_version": key_version,
+            "filename": filename,
+            "questions": [q.to_dict() for q in questions],
+            "question_count": len(questions),
+            "parse_errors": [issue.to_dict() for issue in errors],
+            "created_at": datetime.now(),
+        },
+        upsert=True
+    )
+    # Attempts reference questions by id, so each one needs its shared document
+    store_questions(db, questions)
+
+
+def save_question_bank_entry(db, file_id, pdf_bytes: bytes, filename: str = None, content_hash: str = None, progress=None,
+                             key_version: int = 0):
+    """
+    Parse the PDF once and store its questions under (file_id, content_hash).
+    A file whose key was corrected by a regrade keeps the corrected answers.
+    Returns (questions, parse_errors).
+    """
+    if content_hash is None:
+        content_hash = compute_content_hash(pdf_bytes)
+    errors = []
+    questions = extract_mcqs_from_bytes(pdf_bytes, progress, errors)
+    if key_version:
+        questions = corrected_answers(db, questions)
+    questions = mcq_cache.put(question_set_key(content_hash, key_version), questions)
+    store_question_bank_entry(db, file_id, content_hash, questions, errors, filename, key_version)
+    return questions, errors
+
+
+def load_question_bank_entry(db, file_id, content_hash: str, key_version: int = 0):
+    """Return the stored questions, or None when there is no fresh entry for this file version and answer key."""
+    entry = db.question_bank.find_one(
+        {"file_id": file_id, "content_hash": content_hash, "parser_version": PARSER_VERSION,
+         # Entries stored before answer keys were versioned have no version
+         "answer_key_version": key_version if key_version else {"$in": [0, None]}},
+        {"questions": 1}
+    )
+    if entry is None:
+        return None
+    return tuple(Question.from_dict(q) for q in entry["questions"])
+
+
+def delete_question_bank_entry(db, file_id):
+    db.question_bank.delete_many({"file_id": file_id})
+
+
+def get_practice_questions(db, fs, file_doc: dict, progress=None):
+    """
+    Load the questions for a practice PDF's fs.files document.
+
+    Checks the in-process cache first, then the stored bank entry when its
+    content hash, parser version and answer key version match; otherwise reads the PDF from
+    GridFS, parses it and refreshes the entry. Files uploaded before the bank
+    existed get their content hash recorded so later lookups can skip the
+    GridFS read. ``progress`` is passed to the page-by-page parser when a
+    parse is needed. Returns the process-wide QuestionSet for this file
+    version; it is shared by every session, so callers must not modify it.
+    """
+    file_id = file_doc["_id"]
+    content_hash = (file_doc.get("metadata") or {}).get("content_hash")
+    key_version = answer_key_version(file_doc)
+
+    if content_hash:
+        key = question_set_key(content_hash, key_version)
+        questions = mcq_cache.get(key)
+        if questions is not None:
+            return questions
+        # Evicted from the cache but still in use by running tests
+        questions = find_question_set(key)
+        if questions is not None:
+            return mcq_cache.put(key, questions)
+        questions = load_question_bank_entry(db, file_id, content_hash, key_version)
+        if questions is not None:
+            return mcq_cache.put(key, questions)
+
+    pdf_bytes = fs.get(file_id).read()
+    if not content_hash:
+        content_hash = compute_content_hash(pdf_bytes)
+        db.fs.files.update_one({"_id": file_id}, {"$set": {"metadata.content_hash": content_hash}})
+        questions = load_question_bank_entry(db, file_id, content_hash, key_version)
+        if questions is not None:
+            return mcq_cache.put(question_set_key(content_hash, key_version), questions)
+
+    questions, _ = save_question_bank_entry(db, file_id, pdf_bytes, file_doc.get("filename"), content_hash, progress,
+                                            key_version)
+    return questions
@@ -0,0 +1,228 @@
+"""
+Per-question difficulty statistics across all users.
+
+``question_stats`` holds one document per question and topic, since the same
+question can appear in more than one practice PDF:
+
+    question_id, topic_name, subject, shown, unanswered,
+    option_counts: {"A": n, ..., "D": n},
+    time_sum, time_bins: {"<bin>": n}  (TIME_BIN_SECONDS wide, the last bin open ended)
+
+Counts are added with one $inc upsert per (question, topic) for each batch of
+stored attempts. Correctness is not stored: the p-value is the count of the
+current answer in ``questions`` over ``shown``, so an answer-key regrade
+needs no stats update. Time percentiles come from the bins, which is
+enough to set per-question timers to the nearest TIME_BIN_SECONDS.
+
+    python question_stats.py --report --topic "Climatology"
+    python question_stats.py --rebuild
+"""
+import argparse
+from collections import defaultdict
+from pymongo import MongoClient, ASCENDING, UpdateOne, ReplaceOne
+from attempt_store import unpack_times, NOT_ANSWERED
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+TIME_BIN_SECONDS = 5
+TIME_BIN_COUNT = 120  # up to 10 minutes
+# Questions answered correctly by fewer / more than these fractions are flagged in reports
+HARD_P_VALUE = 0.2
+EASY_P_VALUE = 0.95
+MIN_SHOWN_FOR_REPORT = 20
+
+
+def ensure_question_stats_indexes(db):
+    db.question_stats.create_index([("question_id", ASCENDING), ("topic_name", ASCENDING)], unique=True)
+    db.question_stats.create_index([("topic_name", ASCENDING)])
+
+
+def time_bin(seconds: float) -> int:
+    return min(max(int(seconds // TIME_BIN_SECONDS), 0), TIME_BIN_COUNT - 1)
+
+
+def accumulate_attempts(attempts, totals: dict = None) -> dict:
+    """Per-question counts of compact attempts, added to ``totals`` ((question id, topic) -> counts)."""
+    if totals is None:
+        totals = {}
+    for attempt in attempts:
+        if "question_ids" not in attempt:
+            continue  # attempts still embedding results have no question ids
+        times = unpack_times(attempt["time_taken"]) if "time_taken" in attempt else []
+        topic_name = attempt.get("topic_name")
+        for i, qid in enumerate(attempt["question_ids"]):
+            stats = totals.get((qid, topic_name))
+            if stats is None:
+                stats = totals[qid, topic_name] = {
+                    "subject": attempt.get("subject"), "shown": 0, "unanswered": 0,
+                    "option_counts": defaultdict(int), "time_sum": 0.0, "time_bins": defaultdict(int),
+                }
+            stats["shown"] += 1
+            answer = attempt["answers"][i]
+            if answer == NOT_ANSWERED:
+                stats["unanswered"] += 1
+            else:
+                stats["option_counts"][answer] += 1
+            if i < len(times):
+                stats["time_sum"] += times[i]
+                stats["time_bins"][str(time_bin(times[i]))] += 1
+    return totals
+
+
+def apply_question_stats(db, attempts: list):
+    """Fold a batch of newly stored attempts into the stats, one upsert per question and topic."""
+    operations = []
+    for (qid, topic_name), stats in accumulate_attempts(attempts).items():
+        increments = {"shown": stats["shown"], "unanswered": stats["unanswered"], "time_sum": stats["time_sum"]}
+        increments.update({f"option_counts.{option}": n for option, n in stats["option_counts"].items()})
+        increments.update({f"time_bins.{b}": n for b, n in stats["time_bins"].items()})
+        operations.append(UpdateOne(
+            {"question_id": qid, "topic_name": topic_name},
+            {"$inc": increments, "$set": {"subject": stats["subject"]}},
+            upsert=True
+        ))
+    if operations:
+        db.question_stats.bulk_write(operations, ordered=False)
+
+
+def time_percentile(stats: dict, fraction: float):
+    """Upper edge in seconds of the time bin holding the given fraction of timed answers; None without times."""
+    bins = stats.get("time_bins", {})
+    total = sum(bins.values())
+    if not total:
+        return None
+    seen = 0
+    for b in sorted(bins, key=int):
+        seen += bins[b]
+        if seen >= fraction * total:
+            return (int(b) + 1) * TIME_BIN_SECONDS
+    return TIME_BIN_COUNT * TIME_BIN_SECONDS
+
+
+def question_summary(stats: dict, answer: str = None) -> dict:
+    """p-value, time statistics and most common wrong option of one stats document."""
+    options = stats.get("option_counts", {})
+    shown = stats.get("shown", 0)
+    timed = sum(stats.get("time_bins", {}).values())
+    wrong = {option: n for option, n in options.items() if option != answer}
+    return {
+        "shown": shown,
+        "p_value": options.get(answer, 0) / shown if shown and answer else None,
+        "unanswered_rate": stats.get("unanswered", 0) / shown if shown else None,
+        "mean_time": stats.get("time_sum", 0) / timed if timed else None,
+        "p50_time": time_percentile(stats, 0.5),
+        "p90_time": time_percentile(stats, 0.9),
+        "common_wrong_option": max(wrong, key=wrong.get) if wrong else None,
+    }
+
+
+def topic_question_stats(db, topic_name: str) -> list:
+    """Summaries of every question of a topic, joined with its text and current answer, hardest first."""
+    stats = list(db.question_stats.find({"topic_name": topic_name}))
+    questions = {q["_id"]: q for q in db.questions.find({"_id": {"$in": [s["question_id"] for s in stats]}},
+                                                         {"question": 1, "answer": 1})}
+    rows = []
+    for doc in stats:
+        question = questions.get(doc["question_id"], {})
+        rows.append({"question_id": doc["question_id"], "question": question.get("question", ""),
+                     "answer": question.get("answer"), **question_summary(doc, question.get("answer"))})
+    return sorted(rows, key=lambda row: (row["p_value"] is None, row["p_value"] or 0))
+
+
+def suggested_time_limits(db, question_ids: list, default: int, fraction: float = 0.9,
+                          min_shown: int = MIN_SHOWN_FOR_REPORT) -> dict:
+    """
+    Per-question timer suggestions: the time within which ``fraction`` of
+    answers were given across every topic, for questions with enough data;
+    ``default`` otherwise.
+    """
+    stats = {}
+    for doc in db.question_stats.find({"question_id": {"$in": list(question_ids)}},
+                                      {"question_id": 1, "shown": 1, "time_bins": 1}):
+        merged = stats.setdefault(doc["question_id"], {"shown": 0, "time_bins": defaultdict(int)})
+        merged["shown"] += doc.get("shown", 0)
+        for b, n in doc.get("time_bins", {}).items():
+            merged["time_bins"][b] += n
+    limits = {}
+    for qid in question_ids:
+        doc = stats.get(qid)
+        limit = time_percentile(doc, fraction) if doc and doc.get("shown", 0) >= min_shown else None
+        limits[qid] = limit or default
+    return limits
+
+
+def rebuild_question_stats(db, topic_names: list = None, batch_size: int = 5000) -> int:
+    """
+    Recompute stats from test_attempts, for every topic or just the given
+    ones. Per-question times are packed binary, so attempts are streamed
+    and counted here rather than in an aggregation. Stats are written with
+    upserts keyed on (question_id, topic_name), so a rebuild never collides
+    with attempts being counted in; stats with no attempts left are removed.
+    Returns the attempts read.
+    """
+    ensure_question_stats_indexes(db)
+    match = {"question_ids": {"$exists": True}}
+    if topic_names is not None:
+        match["topic_name"] = {"$in": list(topic_names)}
+    projection = {"question_ids": 1, "answers": 1, "time_taken": 1, "topic_name": 1, "subject": 1}
+    totals = {}
+    attempts_read = 0
+    for attempt in db.test_attempts.find(match, projection, batch_size=batch_size):
+        accumulate_attempts([attempt], totals)
+        attempts_read += 1
+
+    if totals:
+        db.question_stats.bulk_write([
+            ReplaceOne({"question_id": qid, "topic_name": topic_name},
+                       {"question_id": qid, "topic_name": topic_name, **stats,
+                        "option_counts": dict(stats["option_counts"]), "time_bins": dict(stats["time_bins"])},
+                       upsert=True)
+            for (qid, topic_name), stats in totals.items()
+        ], ordered=False)
+
+    rebuilt = defaultdict(list)
+    for qid, topic_name in totals:
+        rebuilt[topic_name].append(qid)
+    scope = {} if topic_names is None else {"topic_name": {"$in": list(topic_names)}}
+    db.question_stats.delete_many({"$and": [scope, {"topic_name": {"$nin": list(rebuilt)}}]})
+    for topic_name, qids in rebuilt.items():
+        db.question_stats.delete_many({"topic_name": topic_name, "question_id": {"$nin": qids}})
+    return attempts_read
+
+
+def print_topic_report(db, topic_name: str):
+    rows = [row for row in topic_question_stats(db, topic_name) if row["shown"] >= MIN_SHOWN_FOR_REPORT]
+    print(f"{len(rows)} questions of {topic_name} shown at least {MIN_SHOWN_FOR_REPORT} times")
+    for row in rows:
+        flag = "HARD" if row["p_value"] is not None and row["p_value"] < HARD_P_VALUE else \
+            "EASY" if row["p_value"] is not None and row["p_value"] > EASY_P_VALUE else ""
+        p_value = f"{row['p_value']:.2f}" if row["p_value"] is not None else "n/a"
+        mean_time = f"{row['mean_time']:.0f}s" if row["mean_time"] is not None else "n/a"
+        print(f"{flag:<5}p={p_value} shown={row['shown']:<6} mean={mean_time:<6} p90={row['p90_time'] or 'n/a'}s "
+              f"key={row['answer']} top wrong={row['common_wrong_option'] or '-'}  {row['question'][:60]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-question difficulty statistics.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute stats from test_attempts")
+    parser.add_argument("--report", action="store_true", help="Print the stats of one topic's questions")
+    parser.add_argument("--topic", help="Topic for --report, or the only topic to --rebuild")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    if args.rebuild:
+        attempts = rebuild_question_stats(db, [args.topic] if args.topic else None)
+        print(f"Rebuilt question stats from {attempts} attempts.")
+    if args.report:
+        if not args.topic:
+            parser.error("--report needs --topic")
+        print_topic_report(db, args.topic)
+    if not (args.rebuild or args.report):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
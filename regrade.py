@@ -0,0 +1,246 @@
+"""
+Regrade stored attempts after an answer-key correction.
+
+A corrected key maps question ids to the right answer letter. It comes
+either from a re-uploaded practice PDF (question ids hash the text and
+options, not the answer, so a fixed key keeps the same ids) or from a JSON
+file of {question_id: letter}. Only questions whose stored answer differs
+are regraded.
+
+Attempts are streamed in batches. Within a batch every attempt's answers
+and correctness flags are laid end to end in one byte array, the positions
+of the corrected questions are found with one np.isin, and those flags and
+the per-attempt totals are recomputed as array operations. Changed attempts
+are written back with one unordered bulk_write per batch. Afterwards the
+answer is fixed in ``questions`` and the question bank, whose answer key
+version is bumped so every server process stops using its cached copy of the
+old key, and the rollups,
+score histograms and leaderboards of the affected topics and subjects are
+rebuilt.
+
+Progress is recorded in ``regrade_jobs`` so the upload page can start a
+regrade in a background thread and poll it:
+
+    python regrade.py --pdf M-01_Climatology_practicequestions.pdf
+    python regrade.py --key corrected_key.json [--dry-run]
+"""
+import json
+import argparse
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import gridfs
+from pymongo import MongoClient, UpdateOne
+from mcq_parser import Question, OPTION_LETTERS, extract_mcqs_from_bytes
+from attempt_store import question_id
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+DEFAULT_BATCH_SIZE = 5000
+CORRECT, INCORRECT = ord("1"), ord("0")
+
+
+def corrected_key_from_questions(questions) -> dict:
+    return {question_id(q): q.answer for q in questions if q.answer}
+
+
+def corrected_key_from_pdf(db, fs, filename: str) -> dict:
+    """The key of the latest stored version of a practice PDF."""
+    file_doc = db.fs.files.find_one({"filename": filename}, sort=[("uploadDate", -1)])
+    if file_doc is None:
+        raise ValueError(f"No file named {filename!r} in GridFS")
+    return corrected_key_from_questions(extract_mcqs_from_bytes(fs.get(file_doc["_id"]).read()))
+
+
+def check_key(key) -> dict:
+    """Raise ValueError unless ``key`` maps question ids to a single answer letter A-D."""
+    if not isinstance(key, dict):
+        raise ValueError("The corrected key must be an object of {question_id: letter}")
+    invalid = [qid for qid, answer in key.items() if answer not in OPTION_LETTERS]
+    if invalid:
+        raise ValueError(f"{len(invalid)} entries are not one of {', '.join(OPTION_LETTERS)}, "
+                         f"e.g. {invalid[0]!r}: {key[invalid[0]]!r}")
+    return key
+
+
+def changed_answers(db, key: dict) -> dict:
+    """The entries of ``key`` that differ from the answers stored in ``questions``."""
+    stored = {q["_id"]: q.get("answer") for q in db.questions.find({"_id": {"$in": list(key)}}, {"answer": 1})}
+    return {qid: answer for qid, answer in key.items() if qid in stored and stored[qid] != answer}
+
+
+def regrade_batch(attempts: list, changed: dict) -> list:
+    """
+    New ``correct`` strings and ``total_score`` values for a batch of compact
+    attempts. Returns (attempt, correct, total_score) for the attempts that
+    changed.
+    """
+    lengths = np.fromiter((len(a["question_ids"]) for a in attempts), dtype=np.int64, count=len(attempts))
+    question_ids = np.concatenate([np.asarray(a["question_ids"], dtype=object) for a in attempts])
+    answers = np.frombuffer("".join(a["answers"] for a in attempts).encode("ascii"), dtype=np.uint8)
+    correct = np.frombuffer("".join(a["correct"] for a in attempts).encode("ascii"), dtype=np.uint8).copy()
+
+    positions = np.isin(question_ids, list(changed))
+    key = pd.Series(question_ids[positions]).map(changed).str.encode("ascii")
+    key_codes = np.frombuffer(b"".join(key), dtype=np.uint8)
+    correct[positions] = np.where(answers[positions] == key_codes, CORRECT, INCORRECT)
+
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    nonempty = lengths > 0
+    totals = np.zeros(len(attempts), dtype=np.int64)
+    totals[nonempty] = np.add.reduceat(correct == CORRECT, offsets[:-1][nonempty])
+
+    flags = correct.tobytes().decode("ascii")
+    regraded = []
+    for i, attempt in enumerate(attempts):
+        new_correct = flags[offsets[i]:offsets[i + 1]]
+        if new_correct != attempt["correct"]:
+            regraded.append((attempt, new_correct, int(totals[i])))
+    return regraded
+
+
+def update_question_bank_answers(db, changed: dict) -> int:
+    """
+    Fix the answer of corrected questions in stored question bank entries and
+    bump the answer key version of their files. Returns entries updated.
+    """
+    from question_bank import answer_key_version
+    updated = 0
+    for entry in db.question_bank.find({}, {"questions": 1, "file_id": 1}):
+        questions = entry.get("questions", [])
+        fixed = False
+        for q in questions:
+            new_answer = changed.get(question_id(Question.from_dict(q)))
+            if new_answer and q["answer"] != new_answer:
+                q["answer"] = new_answer
+                fixed = True
+        if fixed:
+            key_version = answer_key_version(db.fs.files.find_one({"_id": entry["file_id"]}, {"metadata": 1}) or {}) + 1
+            db.question_bank.update_one({"_id": entry["_id"]},
+                                        {"$set": {"questions": questions, "answer_key_version": key_version}})
+            # Lookups read the version from fs.files, so the entry must be fixed first
+            db.fs.files.update_one({"_id": entry["file_id"]}, {"$set": {"metadata.answer_key_version": key_version}})
+            updated += 1
+    return updated
+
+
+def rebuild_derived_stats(db, topic_names: set, subjects: set):
+    from progress_rollups import rebuild_rollups
+    from score_histograms import rebuild_score_histograms
+    from leaderboards import rebuild_leaderboards
+    for topic_name in topic_names:
+        rebuild_rollups(db, topic_name=topic_name)
+    rebuild_score_histograms(db, topic_names)
+    rebuild_leaderboards(db, "topic", topic_names)
+    if subjects:
+        rebuild_leaderboards(db, "subject", subjects)
+
+
+def regrade_attempts(db, key: dict, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False, job_id=None) -> dict:
+    """
+    Regrade every attempt that contains a question whose answer ``key``
+    corrects. Attempts still embedding ``results`` are counted but not
+    changed; run ``attempt_store.py --migrate`` first. Returns a report.
+    """
+    changed = changed_answers(db, check_key(key))
+    report = {"changed_questions": len(changed), "scanned": 0, "regraded": 0, "embedded_skipped": 0}
+    if not changed:
+        return report
+
+    def record_progress(**fields):
+        if job_id is not None:
+            db.regrade_jobs.update_one({"_id": job_id}, {"$set": {**report, **fields}})
+
+    topic_names, subjects = set(), set()
+    projection = {"question_ids": 1, "answers": 1, "correct": 1, "topic_name": 1, "subject": 1}
+    batch = []
+
+    def flush():
+        regraded = regrade_batch(batch, changed)
+        if regraded and not dry_run:
+            db.test_attempts.bulk_write([
+                UpdateOne({"_id": attempt["_id"]}, {"$set": {"correct": flags, "total_score": total}})
+                for attempt, flags, total in regraded
+            ], ordered=False)
+        for attempt, _, _ in regraded:
+            topic_names.add(attempt.get("topic_name"))
+            if attempt.get("subject"):
+                subjects.add(attempt["subject"])
+        report["scanned"] += len(batch)
+        report["regraded"] += len(regraded)
+        batch.clear()
+        record_progress()
+
+    for attempt in db.test_attempts.find({"question_ids": {"$in": list(changed)}}, projection, batch_size=batch_size):
+        batch.append(attempt)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    report["embedded_skipped"] = db.test_attempts.count_documents({"results": {"$exists": True}})
+
+    if not dry_run:
+        db.questions.bulk_write([UpdateOne({"_id": qid}, {"$set": {"answer": answer}})
+                                 for qid, answer in changed.items()], ordered=False)
+        update_question_bank_answers(db, changed)
+        if topic_names:
+            rebuild_derived_stats(db, topic_names, subjects)
+    return report
+
+
+def run_regrade_job(db, key: dict, job_id, batch_size: int = DEFAULT_BATCH_SIZE):
+    try:
+        report = regrade_attempts(db, key, batch_size, job_id=job_id)
+        db.regrade_jobs.update_one({"_id": job_id},
+                                   {"$set": {**report, "status": "done", "finished_at": datetime.now()}})
+    except Exception as e:
+        db.regrade_jobs.update_one({"_id": job_id},
+                                   {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.now()}})
+
+
+def start_regrade_job(db, key: dict, label: str):
+    """Run a regrade in a background thread and return its ``regrade_jobs`` id for polling."""
+    job_id = db.regrade_jobs.insert_one({
+        "label": label, "status": "running", "started_at": datetime.now(),
+        "changed_questions": len(changed_answers(db, key)), "scanned": 0, "regraded": 0,
+    }).inserted_id
+    threading.Thread(target=run_regrade_job, args=(db, key, job_id), name="regrade", daemon=True).start()
+    return job_id
+
+
+def load_regrade_job(db, job_id):
+    return db.regrade_jobs.find_one({"_id": job_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regrade stored attempts after an answer-key correction.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--pdf", help="Filename of the corrected practice PDF in GridFS")
+    source.add_argument("--key", help='JSON file of {"question_id": "A"} corrections')
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    if args.pdf:
+        key = corrected_key_from_pdf(db, gridfs.GridFS(db), args.pdf)
+    else:
+        with open(args.key, encoding="utf-8") as f:
+            key = json.load(f)
+        try:
+            check_key(key)
+        except ValueError as e:
+            parser.error(f"{args.key}: {e}")
+    report = regrade_attempts(db, key, args.batch_size, args.dry_run)
+    print(f"{report['changed_questions']} corrected questions; "
+          f"{'would regrade' if args.dry_run else 'regraded'} {report['regraded']} of {report['scanned']} attempts.")
+    if report["embedded_skipped"]:
+        print(f"{report['embedded_skipped']} attempts still embed results; run attempt_store.py --migrate first.")
+
+
+if __name__ == "__main__":
+    main()
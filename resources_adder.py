@@ -6,6 +6,11 @@ from bson.binary import Binary
 import gridfs
 import gc
 import copy
+from question_bank import compute_content_hash, save_question_bank_entry, delete_question_bank_entry
+from mcq_cache import mcq_cache
+from regrade import corrected_key_from_questions, changed_answers, start_regrade_job, load_regrade_job
+from question_stats import topic_question_stats
+from mcq_parser import extract_topic_from_filename
 
 MONGO_URI = "mongodb://localhost:27017/"
 DB_NAME = "study_resources"
@@ -123,6 +128,7 @@ if uploaded_files:
             
             if existing_file:
                 fs.delete(existing_file["_id"])
+                delete_question_bank_entry(db, existing_file["_id"])
             
             file_id = fs.put(
                 file_data,
@@ -185,6 +191,7 @@ try:
                 if st.button("🗑️ Delete PDF"):
                     try:
                         fs.delete(file_metadata["_id"])
+                        delete_question_bank_entry(db, file_metadata["_id"])
                         st.warning(f"🚮 **{selected_pdf}** has been deleted!")
                         st.session_state.selected_pdf = None
                         st.rerun()
@@ -246,7 +253,9 @@ if pdf_files:
     
             if existing_practice_file:
                 fs.delete(existing_practice_file["_id"])
+                delete_question_bank_entry(db, existing_practice_file["_id"])
     
+            content_hash = compute_content_hash(practice_file_data)
             file_id = fs.put(
                 practice_file_data,
                 filename=practice_filename,
@@ -255,11 +264,30 @@ if pdf_files:
                     "topic": selected_topic,
                     "linked_pdf": selected_study_pdf_filename,
                     "path": folder_path,
-                    "is_practice": True
+                    "is_practice": True,
+                    "content_hash": content_hash
                 }
             )
     
             st.success(f"✅ Practice questions for **{selected_study_pdf}** have been uploaded!")
+
+            # Parse the questions once here so tests load them from the question bank
+            try:
+                questions, parse_errors = save_question_bank_entry(db, file_id, practice_file_data, practice_filename, content_hash)
+                if questions:
+                    st.info(f"🧠 {len(questions)} questions added to the question bank.")
+                else:
+                    st.warning("⚠️ No questions could be parsed from this PDF. Check the question format.")
+                if parse_errors:
+                    with st.expander(f"⚠️ {len(parse_errors)} question(s) could not be parsed"):
+                        for issue in parse_errors:
+                            st.markdown(f"- **Q{issue.question_number or '?'}** (page {issue.page}): {issue.message}")
+                # A re-upload that fixes the answer key leaves past attempts graded with the old one
+                corrected = changed_answers(db, corrected_key_from_questions(questions))
+                if corrected:
+                    st.session_state.pending_regrade = {"label": practice_filename, "key": corrected}
+            except Exception as e:
+                st.error(f"Error building question bank: {str(e)}")
     
         except Exception as e:
             st.error(f"Error uploading practice questions: {str(e)}")
@@ -283,9 +311,26 @@ if pdf_files:
                 unsafe_allow_html=True,
             )
     
+            with st.expander("📊 Question Difficulty"):
+                question_rows = topic_question_stats(db, extract_topic_from_filename(practice_filename))
+                if question_rows:
+                    st.caption("Hardest first. A low p-value with one dominant wrong option often means a wrong answer key.")
+                    st.dataframe([{
+                        "Question": row["question"][:80],
+                        "Key": row["answer"],
+                        "Shown": row["shown"],
+                        "p-value": round(row["p_value"], 2) if row["p_value"] is not None else None,
+                        "Top Wrong Option": row["common_wrong_option"],
+                        "Mean Time (s)": round(row["mean_time"], 1) if row["mean_time"] is not None else None,
+                        "p90 Time (s)": row["p90_time"],
+                    } for row in question_rows], use_container_width=True)
+                else:
+                    st.info("No attempts at these questions yet.")
+
             if st.button("🗑️ Delete Practice Questions"):
                 try:
                     fs.delete(existing_practice_file["_id"])
+                    delete_question_bank_entry(db, existing_practice_file["_id"])
                     st.warning(f"🚮 Practice questions for **{selected_study_pdf}** have been deleted!")
                     st.rerun()
                 except Exception as e:
@@ -294,4 +339,32 @@ if pdf_files:
         except Exception as e:
             st.error(f"Error retrieving practice questions file: {str(e)}")
 
+if st.session_state.get("pending_regrade"):
+    pending = st.session_state.pending_regrade
+    st.warning(f"⚠️ The answer key of **{pending['label']}** changed for {len(pending['key'])} question(s). "
+               "Past attempts were graded with the old key.")
+    if st.button("🔁 Regrade Past Attempts"):
+        st.session_state.regrade_job = start_regrade_job(db, pending["key"], pending["label"])
+        st.session_state.pending_regrade = None
+        st.rerun()
+
+if st.session_state.get("regrade_job"):
+    job = load_regrade_job(db, st.session_state.regrade_job)
+    if job["status"] == "running":
+        st.info(f"🔁 Regrading **{job['label']}**: {job['scanned']} attempts checked, {job['regraded']} regraded so far.")
+        if st.button("Refresh Regrade Status"):
+            st.rerun()
+    elif job["status"] == "done":
+        st.success(f"✅ Regrade of **{job['label']}** finished: {job['regraded']} of {job['scanned']} attempts changed.")
+    else:
+        st.error(f"Regrade of **{job['label']}** failed: {job.get('error')}")
+
+with st.expander("⚙️ Question Cache Stats"):
+    cache_stats = mcq_cache.stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Hits", cache_stats["hits"])
+    col2.metric("Misses", cache_stats["misses"])
+    col3.metric("Hit Rate", f"{cache_stats['hit_rate'] * 100:.1f}%")
+    st.caption(f"{cache_stats['entries']} PDFs cached, {cache_stats['bytes'] / 1024:.0f} KB of {cache_stats['max_bytes'] / 1024:.0f} KB, {cache_stats['evictions']} evictions")
+
 gc.collect()
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Per-topic score distributions for cohort percentiles.
+
+``score_histograms`` holds one document per topic with the number of
+attempts at each whole score percent:
+
+    topic_name, count, bins: {"0": n, ..., "100": n}
+
+It is updated with $inc as attempts are stored, so "you scored in the 83rd
+percentile" is read from one document of at most 101 counters instead of
+scanning test_attempts. Whole-percent bins make the percentile exact to
+within one percentage point. Histograms are rebuilt from test_attempts with:
+
+    python score_histograms.py --rebuild
+"""
+import argparse
+from collections import Counter, defaultdict
+from pymongo import MongoClient, ASCENDING, UpdateOne, ReplaceOne
+from progress_rollups import score_percent
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+BIN_COUNT = 101  # whole percents 0..100
+
+
+def ensure_histogram_indexes(db):
+    db.score_histograms.create_index([("topic_name", ASCENDING)], unique=True)
+
+
+def score_bin(percent: float) -> int:
+    """Whole-percent bin of a score, rounding halves up like the rebuild pipeline."""
+    return min(max(int(percent + 0.5), 0), BIN_COUNT - 1)
+
+
+def apply_score_histograms(db, attempts: list):
+    """Count newly stored attempts into their topics' histograms, one upsert per topic."""
+    bins_by_topic = defaultdict(Counter)
+    for attempt in attempts:
+        bins_by_topic[attempt.get("topic_name")][score_bin(score_percent(attempt))] += 1
+    operations = [
+        UpdateOne({"topic_name": topic_name},
+                  {"$inc": {"count": sum(bins.values()), **{f"bins.{b}": n for b, n in bins.items()}}},
+                  upsert=True)
+        for topic_name, bins in bins_by_topic.items()
+    ]
+    if operations:
+        db.score_histograms.bulk_write(operations, ordered=False)
+
+
+def load_histogram(db, topic_name: str):
+    return db.score_histograms.find_one({"topic_name": topic_name}, {"_id": 0})
+
+
+def percentile_rank(histogram: dict, percent: float):
+    """
+    Percentage of the topic's attempts scoring below ``percent``, counting
+    ties as half. None when the histogram is empty.
+    """
+    if not histogram or not histogram.get("count"):
+        return None
+    bins = histogram.get("bins", {})
+    target = score_bin(percent)
+    below = sum(n for b, n in bins.items() if int(b) < target)
+    return (below + bins.get(str(target), 0) / 2) / histogram["count"] * 100
+
+
+def histogram_bands(histogram: dict, width: int = 10) -> dict:
+    """Attempt counts per score band ("0-9", ..., "90-100") for a distribution chart."""
+    starts = range(0, BIN_COUNT - 1, width)
+    # The last band also takes 100%
+    labels = [f"{start}-{start + width - 1}" for start in starts[:-1]] + [f"{starts[-1]}-{BIN_COUNT - 1}"]
+    bands = dict.fromkeys(labels, 0)
+    for b, n in (histogram or {}).get("bins", {}).items():
+        bands[labels[min(int(b) // width, len(labels) - 1)]] += n
+    return bands
+
+
+def rebuild_score_histograms(db, topic_names: list = None) -> int:
+    """
+    Recompute histograms from test_attempts, for every topic or just the
+    given ones. The binning is done by an aggregation, so only (topic, bin,
+    count) rows come back. Histograms are written with upserts keyed on
+    topic_name, so a rebuild never collides with attempts being counted in;
+    histograms of topics with no attempts left are removed. Returns the
+    number of attempts counted.
+    """
+    ensure_histogram_indexes(db)
+    match = {} if topic_names is None else {"topic_name": {"$in": list(topic_names)}}
+    percent = {"$multiply": [
+        {"$divide": [{"$ifNull": ["$total_score", 0]},
+                     {"$cond": [{"$gt": ["$total_questions", 0]}, "$total_questions", 1]}]},
+        100
+    ]}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"topic_name": "$topic_name", "bin": {"$floor": {"$add": [percent, 0.5]}}},
+            "count": {"$sum": 1},
+        }},
+    ]
+    histograms = {}
+    for row in db.test_attempts.aggregate(pipeline, allowDiskUse=True):
+        topic_name = row["_id"]["topic_name"]
+        histogram = histograms.setdefault(topic_name, {"topic_name": topic_name, "count": 0, "bins": {}})
+        b = str(min(max(int(row["_id"]["bin"]), 0), BIN_COUNT - 1))
+        histogram["bins"][b] = histogram["bins"].get(b, 0) + row["count"]
+        histogram["count"] += row["count"]
+
+    if histograms:
+        db.score_histograms.bulk_write([
+            ReplaceOne({"topic_name": topic_name}, histogram, upsert=True)
+            for topic_name, histogram in histograms.items()
+        ], ordered=False)
+    db.score_histograms.delete_many({"$and": [match, {"topic_name": {"$nin": list(histograms)}}]})
+    return sum(histogram["count"] for histogram in histograms.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-topic score histograms for percentile ranks.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute histograms from test_attempts")
+    parser.add_argument("--topic", action="append", help="Only rebuild this topic (may be repeated)")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri)[args.db_name]
+    if args.rebuild:
+        print(f"Rebuilt histograms from {rebuild_score_histograms(db, args.topic)} attempts.")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
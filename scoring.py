@@ -0,0 +1,144 @@
+"""
+Pluggable scoring schemes, including UPSC-style negative marking.
+
+A scheme gives marks for a correct, an incorrect and an unanswered question,
+plus optional per-section (subject) weights. The marks of an attempt are
+linear in its (correct, incorrect, unanswered) counts, so scoring a whole
+history under any number of schemes is one matrix product over an (n, 3)
+count array; nothing is re-read from the answers. Those counts come from
+the compact answer and correctness strings, or from the progress rollups.
+
+Attempts stored before ``unanswered`` was recorded get it filled in with:
+
+    python scoring.py --backfill
+"""
+import argparse
+from typing import NamedTuple
+import numpy as np
+from pymongo import MongoClient, UpdateOne
+from attempt_store import NOT_ANSWERED
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "study_resources"
+
+
+class ScoringScheme(NamedTuple):
+    """Marks per correct/incorrect/unanswered question. ``section_weights`` is a tuple of (subject, weight) pairs."""
+    name: str
+    correct: float
+    incorrect: float
+    unanswered: float = 0.0
+    section_weights: tuple = ()
+
+    def weight(self, section) -> float:
+        return dict(self.section_weights).get(section, 1.0)
+
+    def marks(self) -> np.ndarray:
+        return np.array([self.correct, self.incorrect, self.unanswered], dtype=float)
+
+
+SCHEMES = {
+    scheme.name: scheme for scheme in (
+        ScoringScheme("Correct answers", 1, 0),
+        ScoringScheme("UPSC Prelims GS (+2 / -0.66)", 2, -0.66),
+        ScoringScheme("UPSC CSAT (+2.5 / -0.83)", 2.5, -0.83),
+    )
+}
+DEFAULT_SCHEME = "Correct answers"
+
+
+def count_matrix(correct, incorrect, unanswered) -> np.ndarray:
+    """(n, 3) array of per-attempt (correct, incorrect-but-answered, unanswered) counts."""
+    return np.column_stack([correct, incorrect, unanswered]).astype(float)
+
+
+def score_counts(counts: np.ndarray, schemes: list, sections=None) -> np.ndarray:
+    """
+    Marks of every attempt under every scheme: an (n, len(schemes)) array.
+    ``counts`` rows are (correct, incorrect-but-answered, unanswered);
+    ``sections`` gives each attempt's subject for the section weights.
+    """
+    marks = np.column_stack([scheme.marks() for scheme in schemes])
+    scores = counts @ marks
+    if sections is not None and any(scheme.section_weights for scheme in schemes):
+        sections = list(sections)
+        scores *= np.array([[scheme.weight(section) for scheme in schemes] for section in sections])
+    return scores
+
+
+def maximum_marks(question_counts, schemes: list, sections=None) -> np.ndarray:
+    """Marks for answering every question correctly, in the same shape as score_counts."""
+    counts = np.column_stack([np.asarray(question_counts, dtype=float),
+                              np.zeros(len(question_counts)), np.zeros(len(question_counts))])
+    return score_counts(counts, schemes, sections)
+
+
+def answer_counts(answers: str, correct: str) -> tuple:
+    """(correct, incorrect, unanswered) from an attempt's compact answer and correctness strings."""
+    right = correct.count("1")
+    unanswered = answers.count(NOT_ANSWERED)
+    return right, len(correct) - right - unanswered, unanswered
+
+
+def score_attempt(attempt: dict, scheme: ScoringScheme) -> float:
+    right, wrong, unanswered = answer_counts(attempt["answers"], attempt["correct"])
+    return score_counts(np.array([[right, wrong, unanswered]], dtype=float), [scheme],
+                        [attempt.get("subject")])[0, 0]
+
+
+def score_recent(recent: list, scheme: ScoringScheme, section=None) -> tuple:
+    """
+    (marks, maximum) arrays for rollup ``recent`` entries, whose ``incorrect``
+    includes the unanswered questions.
+    """
+    correct = np.array([entry["correct"] for entry in recent], dtype=float)
+    incorrect = np.array([entry["incorrect"] for entry in recent], dtype=float)
+    unanswered = np.array([entry.get("unanswered", 0) for entry in recent], dtype=float)
+    sections = [section] * len(recent)
+    marks = score_counts(count_matrix(correct, incorrect - unanswered, unanswered), [scheme], sections)[:, 0]
+    maximum = maximum_marks(correct + incorrect, [scheme], sections)[:, 0]
+    return marks, maximum
+
+
+def backfill_unanswered(db, batch_size: int = 1000) -> int:
+    """Record ``unanswered`` on compact attempts stored before it existed, then rebuild rollups."""
+    from progress_rollups import rebuild_rollups
+    operations = []
+    updated = 0
+    for attempt in db.test_attempts.find({"answers": {"$exists": True}, "unanswered": {"$exists": False}},
+                                         {"answers": 1}):
+        operations.append(UpdateOne({"_id": attempt["_id"]},
+                                    {"$set": {"unanswered": attempt["answers"].count(NOT_ANSWERED)}}))
+        if len(operations) >= batch_size:
+            db.test_attempts.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        db.test_attempts.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    if updated:
+        rebuild_rollups(db)
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring schemes for test attempts.")
+    parser.add_argument("--backfill", action="store_true", help="Record unanswered counts on older attempts")
+    parser.add_argument("--list", action="store_true", help="List the available schemes")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db-name", default=DB_NAME)
+    args = parser.parse_args()
+
+    if args.list:
+        for scheme in SCHEMES.values():
+            print(f"{scheme.name}: {scheme.correct:+g} correct, {scheme.incorrect:+g} incorrect, "
+                  f"{scheme.unanswered:+g} unanswered")
+    if args.backfill:
+        db = MongoClient(args.mongo_uri)[args.db_name]
+        print(f"Recorded unanswered counts on {backfill_unanswered(db)} attempts.")
+    if not (args.list or args.backfill):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import random
+from array import array
+
+
+class PendingQuestions:
+    """
+    Questions that are neither answered nor expired, in question order.
+
+    A doubly linked list over question indices stored in two int arrays, with
+    a sentinel at index ``count``. Removing a question and finding the next one
+    to show are both O(1), so moving on after a submit or an expiry no longer
+    scans the whole test.
+    """
+
+    __slots__ = ("_next", "_prev", "_sentinel", "_size")
+
+    def __init__(self, count: int):
+        self._sentinel = count
+        # Circular list: sentinel -> 0 -> 1 -> ... -> count - 1 -> sentinel
+        self._next = array("i", range(1, count + 2))
+        self._next[count] = 0 if count else count
+        self._prev = array("i", range(-1, count))
+        self._prev[0] = count
+        self._size = count
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, index: int) -> bool:
+        return 0 <= index < self._sentinel and self._next[index] != -1
+
+    def __iter__(self):
+        node = self._next[self._sentinel]
+        while node != self._sentinel:
+            yield node
+            node = self._next[node]
+
+    def remove(self, index: int):
+        if index not in self:
+            return
+        prev_node, next_node = self._prev[index], self._next[index]
+        self._next[prev_node] = next_node
+        self._prev[next_node] = prev_node
+        self._next[index] = self._prev[index] = -1
+        self._size -= 1
+
+    def first_other_than(self, index: int):
+        """The lowest pending question that is not ``index``, or None."""
+        node = self._next[self._sentinel]
+        if node == index:
+            node = self._next[node]
+        return None if node == self._sentinel else node
+
+
+class ShuffledQuestions:
+    """
+    One session's view of a shared question set: the set itself is referenced,
+    never copied, and the session only owns the order it sees the questions in,
+    as an array of indices. Indexing and iteration go through that order.
+    """
+
+    __slots__ = ("questions", "order")
+
+    def __init__(self, questions, order=None):
+        self.questions = questions
+        if order is None:
+            order = list(range(len(questions)))
+            random.shuffle(order)
+        self.order = array("I", order)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, index: int):
+        return self.questions[self.order[index]]
+
+    def __iter__(self):
+        questions = self.questions
+        for index in self.order:
+            yield questions[index]
+
+    def __bool__(self) -> bool:
+        return len(self.order) > 0
+
+
+# Status codes stored in TestSession.status
+PENDING, ACTIVE, COMPLETED, EXPIRED = 0, 1, 2, 3
+STATUS_NAMES = ("pending", "active", "completed", "expired")
+ANSWER_LETTERS = "ABCD"
+NO_ANSWER = -1
+
+
+class TestSession:
+    """
+    State of one running test, kept as flat typed arrays instead of
+    per-question dicts: remaining seconds and time taken as float32, status
+    and chosen option as one signed byte each. Only the current question's
+    clock runs, against an absolute deadline. Results with question text are
+    built from this only when the test finishes.
+    """
+
+    __slots__ = ("seconds_per_question", "remaining", "status", "answers", "time_taken", "pending",
+                 "current_index", "deadline", "question_started", "completed_count", "expired_count")
+
+    def __init__(self, question_count: int, seconds_per_question: float, now: float):
+        self.seconds_per_question = seconds_per_question
+        self.remaining = array("f", [seconds_per_question]) * question_count
+        self.status = array("b", [PENDING]) * question_count
+        self.answers = array("b", [NO_ANSWER]) * question_count
+        self.time_taken = array("f", [0.0]) * question_count
+        self.pending = PendingQuestions(question_count)
+        self.current_index = question_count
+        self.deadline = None
+        self.question_started = now
+        self.completed_count = 0
+        self.expired_count = 0
+        if question_count:
+            self.activate(0, now)
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    @property
+    def finished(self) -> bool:
+        return self.current_index >= len(self.status)
+
+    def remaining_time(self, index: int, now: float) -> float:
+        if index == self.current_index and self.deadline is not None:
+            return max(0.0, self.deadline - now)
+        return self.remaining[index]
+
+    def status_name(self, index: int) -> str:
+        return STATUS_NAMES[self.status[index]]
+
+    def answer_letter(self, index: int):
+        code = self.answers[index]
+        return None if code == NO_ANSWER else ANSWER_LETTERS[code]
+
+    def set_answer(self, index: int, letter):
+        self.answers[index] = ANSWER_LETTERS.index(letter) if letter else NO_ANSWER
+
+    def _pause_current(self, now: float):
+        index = self.current_index
+        if index < len(self.status) and self.status[index] == ACTIVE:
+            self.remaining[index] = self.remaining_time(index, now)
+            self.time_taken[index] += now - self.question_started
+            self.status[index] = PENDING
+
+    def activate(self, index: int, now: float):
+        """Pause the current question's clock and start the deadline for ``index``."""
+        self._pause_current(now)
+        self.current_index = index
+        self.status[index] = ACTIVE
+        self.deadline = now + self.remaining[index]
+        self.question_started = now
+
+    def close_question(self, index: int, status: int, now: float):
+        """Mark the current question answered or expired and move to the next pending one."""
+        if self.status[index] == ACTIVE:
+            self.time_taken[index] += now - self.question_started
+        if status == EXPIRED:
+            self.remaining[index] = 0
+            self.expired_count += 1
+        else:
+            self.remaining[index] = self.remaining_time(index, now)
+            self.completed_count += 1
+        self.status[index] = status
+        self.pending.remove(index)
+        self.deadline = None
+        next_index = self.pending.first_other_than(index)
+        if next_index is None:
+            self.current_index = len(self.status)
+        else:
+            self.activate(next_index, now)
+
+    def expire_if_due(self, now: float) -> bool:
+        """Expire the current question if its deadline has passed. Returns True if it did."""
+        if self.finished or self.deadline is None or self.deadline > now:
+            return False
+        self.close_question(self.current_index, EXPIRED, now)
+        return True
+
+    def build_results(self, mcqs) -> list:
+        """
+        Per-question result dicts in the shape stored with test attempts. A choice
+        on a question that was never submitted or expired counts as not answered.
+        """
+        results = []
+        for i, question in enumerate(mcqs):
+            user_answer = self.answer_letter(i) if self.status[i] in (COMPLETED, EXPIRED) else None
+            results.append({
+                "question": question.question,
+                "user_answer": user_answer if user_answer else "Not answered",
+                "correct_answer": question.answer,
+                "is_correct": user_answer == question.answer,
+                "time_taken": float(self.time_taken[i])
+            })
+        return results
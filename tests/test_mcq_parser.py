@@ -0,0 +1,104 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcq_parser import parse_mcqs_from_text, parse_mcqs_from_pages  # noqa: E402
+
+
+def question(number, answer="A", text=None):
+    lines = [f"{number}. {text or f'Question {number}?'}"]
+    lines += [f"{letter}) option {letter.lower()}{number}" for letter in "ABCD"]
+    if answer:
+        lines.append(f"Answer: {answer}")
+    return "\n".join(lines)
+
+
+def parse(text):
+    errors = []
+    return parse_mcqs_from_text(text, errors), errors
+
+
+def test_well_formed_questions():
+    questions, errors = parse("\n".join([question(1, "A"), question(2, "C")]))
+    assert [(q.question, q.answer) for q in questions] == [("Question 1?", "A"), ("Question 2?", "C")]
+    assert dict(questions[1].options)["D"] == "option d2"
+    assert errors == []
+
+
+def test_multiline_question_and_options():
+    text = "1. Consider the following\n1. first statement\n2. second statement\nWhich are correct?\n" \
+           "A) 1 only\nB) 2 only\nC) Both 1 and\n2\nD) Neither\nAnswer: C"
+    questions, errors = parse(text)
+    assert questions[0].question == "Consider the following\n1. first statement\n2. second statement\nWhich are correct?"
+    assert dict(questions[0].options)["C"] == "Both 1 and\n2"
+    assert errors == []
+
+
+def test_answer_letter_on_next_line():
+    questions, errors = parse("1. Q?\nA) a\nB) b\nC) c\nD) d\nAnswer:\nB")
+    assert questions[0].answer == "B"
+    assert errors == []
+
+
+def test_wrapped_option_starting_with_a_number():
+    text = "1. When?\nA) In August of\n1947. After the war\nB) 1950\nC) 1930\nD) 1960\nAnswer: A"
+    questions, errors = parse(text)
+    assert dict(questions[0].options)["A"] == "In August of\n1947. After the war"
+    assert errors == []
+
+
+def test_missing_answer_before_next_question():
+    questions, errors = parse("\n".join([question(1, answer=None), question(2, "B")]))
+    assert [q.question for q in questions] == ["Question 2?"]
+    assert [(e.question_number, e.message) for e in errors] == [("1", "missing 'Answer:' line")]
+
+
+def test_missing_answer_before_skipped_number():
+    questions, errors = parse("\n".join([question(5, answer=None), question(7, "B")]))
+    assert [(q.question, q.answer) for q in questions] == [("Question 7?", "B")]
+    assert dict(questions[0].options)["D"] == "option d7"
+    assert [(e.question_number, e.message) for e in errors] == [("5", "missing 'Answer:' line")]
+
+
+def test_missing_answer_before_restarted_numbering():
+    questions, errors = parse("\n".join([question(12, answer=None), question(1, "D")]))
+    assert [(q.question, q.answer) for q in questions] == [("Question 1?", "D")]
+    assert [e.question_number for e in errors] == ["12"]
+
+
+def test_missing_option():
+    questions, errors = parse("1. Q?\nA) a\nB) b\nC) c\n2. Next?\nA) a\nB) b\nC) c\nD) d\nAnswer: A")
+    assert [q.question for q in questions] == ["Next?"]
+    assert [(e.question_number, e.message) for e in errors] == [("1", "missing option D)")]
+
+
+def test_answer_before_all_options():
+    questions, errors = parse("1. Q?\nA) a\nB) b\nAnswer: A\n" + question(2))
+    assert [q.question for q in questions] == ["Question 2?"]
+    assert errors[0].message == "'Answer:' found after only 2 of 4 options"
+
+
+def test_bad_answer_letter():
+    questions, errors = parse("1. Q?\nA) a\nB) b\nC) c\nD) d\nAnswer:\nE\n" + question(2))
+    assert [q.question for q in questions] == ["Question 2?"]
+    assert errors[0].message == "'Answer:' is not followed by A, B, C or D"
+
+
+def test_unfinished_question_at_end():
+    questions, errors = parse(question(1) + "\n" + question(2, answer=None))
+    assert len(questions) == 1
+    assert [(e.question_number, e.message) for e in errors] == [("2", "document ended before the question was complete")]
+
+
+def test_question_split_over_pages():
+    errors = []
+    questions = parse_mcqs_from_pages(["1. Q?\nA) a\nB) b", "C) c\nD) d\nAnswer: D\n" + question(2)], errors=errors)
+    assert [q.answer for q in questions] == ["D", "A"]
+    assert errors == []
+
+
+def test_parse_issue_records_starting_page():
+    errors = []
+    parse_mcqs_from_pages([question(1), "2. Q?\nA) a", "Answer: A"], errors=errors)
+    assert [(e.question_number, e.page) for e in errors] == [("2", 2)]
@@ -0,0 +1,80 @@
+import os
+import streamlit.components.v1 as components
+from test_session import ANSWER_LETTERS, PENDING, COMPLETED, EXPIRED
+
+# Extra seconds allowed on top of the limits for network and rendering delays
+TIMING_GRACE_SECONDS = 5
+
+_timed_test = components.declare_component(
+    "timed_test",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "timed_test")
+)
+
+
+def timed_test(mcqs: list, seconds_per_question: int, test_id: str, key: str = None):
+    """
+    Run the whole test in the browser: countdowns, navigation and focus-loss
+    detection happen client side and the answers come back in one message.
+    Correct answers are never sent to the browser.
+
+    Returns None until the test is submitted, then the submission dict.
+    """
+    questions = [{"question": q.question, "options": [list(option) for option in q.options]} for q in mcqs]
+    return _timed_test(
+        questions=questions,
+        seconds_per_question=seconds_per_question,
+        test_id=test_id,
+        key=key,
+        default=None
+    )
+
+
+def apply_client_submission(test_session, submission: dict, seconds_per_question: int, server_elapsed: float) -> bool:
+    """
+    Load a browser submission into ``test_session`` and check its timings
+    against what the server allows.
+
+    A question whose reported time is negative or longer than its limit has its
+    answer discarded. If the reported times add up to more than the wall-clock
+    time the server measured since the test started, or that time is longer
+    than the whole test allows, the submission is flagged.
+    Questions the browser did not close stay pending and count as not answered.
+    Returns timing_violation.
+    """
+    answers = submission.get("answers") or []
+    times = submission.get("time_taken") or []
+    statuses = submission.get("status") or []
+    limit = seconds_per_question + TIMING_GRACE_SECONDS
+    total_reported = 0.0
+
+    for i in range(len(test_session)):
+        user_answer = answers[i] if i < len(answers) else None
+        try:
+            time_taken = float(times[i]) if i < len(times) else 0.0
+        except (TypeError, ValueError):
+            time_taken = -1.0
+        if time_taken < 0 or time_taken > limit:
+            user_answer = None
+            time_taken = min(max(time_taken, 0.0), float(seconds_per_question))
+        if user_answer not in tuple(ANSWER_LETTERS):
+            user_answer = None
+        total_reported += time_taken
+        test_session.set_answer(i, user_answer)
+        test_session.time_taken[i] = time_taken
+        status = statuses[i] if i < len(statuses) else None
+        if status == "expired":
+            test_session.status[i] = EXPIRED
+            test_session.expired_count += 1
+            test_session.pending.remove(i)
+        elif status == "completed":
+            test_session.status[i] = COMPLETED
+            test_session.completed_count += 1
+            test_session.pending.remove(i)
+        else:
+            test_session.status[i] = PENDING
+
+    test_session.current_index = len(test_session)
+    test_session.deadline = None
+    # A paused or tampered timer can report short times while the test runs on indefinitely
+    overran = server_elapsed > len(test_session) * seconds_per_question + TIMING_GRACE_SECONDS
+    return total_reported > server_elapsed + TIMING_GRACE_SECONDS or overran